@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from commands.histogram import CHARTS, HistogramGenerator
+from commands.stats_index import BREAKDOWN_FIELDS, StatsIndex
+from commands.web_gen import WebGenerator
+from main import create_storage
+from storage.movie_table import MovieTable
+
+ROOT_PATH = Path(__file__).parent
+STAGES = ('load', 'site', 'charts', 'stats')
+
+
+def parse_args():
+    """Parse the terminal call arguments"""
+    parser = argparse.ArgumentParser(
+        description="Builds the website, charts and stats of several "
+                    "storage files in parallel processes")
+    parser.add_argument("storage_files", nargs="+",
+                        help="paths of the storage files to build")
+    parser.add_argument("--output", default=os.path.join(ROOT_PATH, "build"),
+                        help="directory of the builds, one folder per file")
+    parser.add_argument("--workers", type=int,
+                        help="number of processes (default: cpu count)")
+    parser.add_argument("--per-page", type=int, default=500, metavar="N",
+                        help="movies per website page (default: 500)")
+    parser.add_argument("--report", metavar="FILE",
+                        help="also write the timing report to a json file")
+    return parser.parse_args()
+
+
+def load_movies(storage_path) -> MovieTable:
+    """Reads the storage file into a MovieTable, which keeps the movies as
+    a few arrays instead of a dictionary of dictionaries"""
+    storage = create_storage(storage_path, cache=False)
+    return MovieTable(storage.iter_movies())
+
+
+def build_site(movies: MovieTable, output_dir, per_page) -> int:
+    """Writes the paginated website and its style sheet"""
+    os.makedirs(output_dir, exist_ok=True)
+    shutil.copy(os.path.join(ROOT_PATH, "_static", "style.css"), output_dir)
+    return WebGenerator(movies).stream_web_pages(output_dir, per_page)
+
+
+def build_charts(movies: MovieTable, output_dir) -> dict:
+    """Writes the png of every chart"""
+    os.makedirs(output_dir, exist_ok=True)
+    return HistogramGenerator(output_dir).generate(movies.items(), CHARTS)
+
+
+def build_stats(movies: MovieTable, output_dir) -> dict:
+    """Writes the ratings statistics to stats.json"""
+    os.makedirs(output_dir, exist_ok=True)
+    stats_index = StatsIndex(movies.items())
+    stats = {'count': stats_index.count}
+    if stats_index.count:
+        stats.update({'average': stats_index.average,
+                      'median': stats_index.median,
+                      'best_movies': stats_index.best_movies,
+                      'worst_movies': stats_index.worst_movies})
+        for field in BREAKDOWN_FIELDS:
+            stats[field] = stats_index.breakdown(field)
+    with open(os.path.join(output_dir, "stats.json"), 'w') as file:
+        file.write(json.dumps(stats, indent=4))
+    return stats
+
+
+STAGE_FUNCTIONS = {'site': build_site, 'charts': build_charts,
+                   'stats': build_stats}
+
+
+def get_error(error) -> str:
+    """Returns the report text of a stage error"""
+    return f"{type(error).__name__}: {error}"
+
+
+def build_file(storage_path, build_dir, per_page) -> dict:
+    """Loads the storage file once and runs its site, charts and stats
+    stages one after another in this worker process, so the table is never
+    sent between processes. Returns the number of movies, the seconds of
+    every stage and the errors of the failed stages, whose seconds are
+    None."""
+    times = dict.fromkeys(('movies', *STAGES))
+    times['errors'] = {}
+    start = time.perf_counter()
+    try:
+        movies = load_movies(storage_path)
+    except Exception as error:
+        times['errors']['load'] = get_error(error)
+        return times
+    times['load'] = time.perf_counter() - start
+    times['movies'] = len(movies)
+    stage_args = {'site': (os.path.join(build_dir, "site"), per_page),
+                  'charts': (build_dir,),
+                  'stats': (build_dir,)}
+    for stage, args in stage_args.items():
+        start = time.perf_counter()
+        try:
+            STAGE_FUNCTIONS[stage](movies, *args)
+        except Exception as error:
+            times['errors'][stage] = get_error(error)
+        else:
+            times[stage] = time.perf_counter() - start
+    return times
+
+
+def get_build_name(storage_path) -> str:
+    """Returns the build folder name, e.g. movies_json for movies.json"""
+    path = Path(storage_path)
+    return f"{path.stem}_{path.suffix.lstrip('.')}"
+
+
+def get_build_names(storage_paths) -> dict:
+    """Returns the build folder name of every storage path, same-named files
+    from different directories get a number, e.g. movies_json_2"""
+    names = {}
+    for path in storage_paths:
+        name = base_name = get_build_name(path)
+        number = 1
+        while name in names.values():
+            number += 1
+            name = f"{base_name}_{number}"
+        names[path] = name
+    return names
+
+
+def batch_build(storage_paths, output_dir, workers=None, per_page=500):
+    """Builds every storage file in parallel, each file in one worker
+    process. Returns a report of the seconds of every stage per file and
+    of the whole build. A failed stage doesn't stop the others, its error
+    is stored in the "errors" of its file and its seconds are None."""
+    start = time.perf_counter()
+    names = get_build_names(dict.fromkeys(storage_paths))
+    report = {'files': dict.fromkeys(names.values())}
+    with ProcessPoolExecutor(workers) as pool:
+        builds = {pool.submit(build_file, path,
+                              os.path.join(output_dir, name), per_page): name
+                  for path, name in names.items()}
+        for future in as_completed(builds):
+            name = builds[future]
+            try:
+                report['files'][name] = future.result()
+            except Exception as error:
+                # The worker process itself failed, e.g. it was killed
+                report['files'][name] = {
+                    'movies': None, **dict.fromkeys(STAGES),
+                    'errors': {'build': get_error(error)}}
+    report['wall'] = time.perf_counter() - start
+    report['stages'] = sum(times[stage] or 0
+                           for times in report['files'].values()
+                           for stage in STAGES)
+    return report
+
+
+def print_report(report) -> None:
+    """Prints the seconds of every stage per file and the failed stages"""
+    print(f"{'file':<30} {'movies':>8}" +
+          ''.join(f" {stage:>8}" for stage in STAGES))
+    for name, times in report['files'].items():
+        movies = '-' if times['movies'] is None else times['movies']
+        print(f"{name:<30} {movies:>8}" +
+              ''.join(f" {'failed':>8}" if times[stage] is None
+                      else f" {times[stage]:>7.2f}s" for stage in STAGES))
+    for name, times in report['files'].items():
+        for stage, error in times['errors'].items():
+            print(f"{name} {stage} failed: {error}")
+    print(f"Stages took {report['stages']:.2f}s, "
+          f"the build took {report['wall']:.2f}s "
+          f"({report['stages'] / report['wall']:.1f}x)")
+
+
+def main():
+    """Batch build initialization"""
+    args = parse_args()
+    missing = [path for path in args.storage_files if not os.path.isfile(path)]
+    if missing:
+        print(f"Storage files not found: {', '.join(missing)}")
+        return
+    report = batch_build(args.storage_files, args.output, args.workers,
+                         args.per_page)
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w') as file:
+            file.write(json.dumps(report, indent=4))
+
+
+if __name__ == '__main__':
+    main()
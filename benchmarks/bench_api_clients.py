@@ -0,0 +1,47 @@
+"""Throughput of the sync and async API clients against the local stub
+server. Run from the project root:
+
+    python -m benchmarks.bench_api_clients --titles 500
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.stub_omdb import start_stub_server
+from commands.api_request import MovieAPIRequest
+from commands.async_api_request import AsyncMovieAPIRequest
+
+
+async def fetch_async(api_url, titles, concurrency):
+    async with AsyncMovieAPIRequest(api_url=api_url,
+                                    max_concurrency=concurrency) as client:
+        return await client.get_many(titles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--titles', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=20)
+    args = parser.parse_args()
+
+    server, api_url = start_stub_server()
+    titles = [f'Movie {index}' for index in range(args.titles)]
+
+    start = time.perf_counter()
+    api_request = MovieAPIRequest(api_url=api_url)
+    for title in titles:
+        api_request.get_movie_data(title)
+    sync_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    asyncio.run(fetch_async(api_url, titles, args.concurrency))
+    async_time = time.perf_counter() - start
+    server.shutdown()
+
+    print(f'sync:  {args.titles / sync_time:8.0f} titles/s')
+    print(f'async: {args.titles / async_time:8.0f} titles/s '
+          f'(concurrency {args.concurrency})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Benchmark of a cold open and a title lookup with StorageBinary against
+StorageJson. Run from the project root:
+
+    python -m benchmarks.bench_binary_open --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import make_catalogue
+from storage.storage_binary import StorageBinary
+from storage.storage_json import StorageJson
+
+
+def open_and_lookup(storage_class, path, title):
+    """Opens the storage and reads one movie, returns the seconds taken"""
+    start = time.perf_counter()
+    movie = storage_class(path).list_movies()[title]
+    assert movie['title']
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f'{"movies":>9} {"json open":>10} {"binary open":>12} '
+          f'{"binary MB":>10}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            catalogue = make_catalogue(size)
+            title = list(catalogue)[size // 2]
+            json_path = os.path.join(tmp_dir, f'bench_{size}.json')
+            binary_path = os.path.join(tmp_dir, f'bench_{size}.bin')
+            StorageJson(json_path).save_to_json(catalogue)
+            StorageBinary(binary_path).save_snapshot(catalogue.items())
+            del catalogue
+
+            json_open = open_and_lookup(StorageJson, json_path, title)
+            binary_open = open_and_lookup(StorageBinary, binary_path, title)
+            print(f'{size:>9} {json_open:>9.3f}s {binary_open * 1000:>9.2f}ms '
+                  f'{os.path.getsize(binary_path) / 1e6:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
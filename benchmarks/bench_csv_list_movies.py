@@ -0,0 +1,74 @@
+"""Benchmark of StorageCsv.list_movies and save_to_csv against the previous
+row by row implementation. Run from the project root:
+
+    python -m benchmarks.bench_csv_list_movies --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_catalogue
+from storage.storage_csv import StorageCsv
+
+
+def iterrows_list_movies(file_path):
+    """The previous list_movies implementation, kept for comparison"""
+    movies_data = {}
+    df = pd.read_csv(file_path)
+    for i, row in df.iterrows():
+        movie_dict = {}
+        for key in df.columns:
+            if pd.notna(row[key]):
+                movie_dict[key] = row[key]
+        movies_data[row["title"].lower()] = movie_dict
+    return movies_data
+
+
+def iterrows_save_to_csv(file_path, data):
+    """The previous save_to_csv implementation, kept for comparison"""
+    data_list = []
+    headers = set()
+    for key, value in data.items():
+        headers.update(value.keys())
+        data_list.append(value)
+    df = pd.DataFrame(data_list, columns=list(headers))
+    df.to_csv(file_path, index=False)
+
+
+def timed(func, *args):
+    """Returns the result of the call and the seconds it took"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f'{"rows":>9} {"old list":>9} {"new list":>9} {"speedup":>8} '
+          f'{"old save":>9} {"new save":>9} {"speedup":>8}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            path = os.path.join(tmp_dir, f'bench_{size}.csv')
+            catalogue = make_catalogue(size)
+            storage = StorageCsv(path)
+
+            _, old_save = timed(iterrows_save_to_csv, path, catalogue)
+            _, new_save = timed(storage.save_to_csv, catalogue)
+            old_movies, old_list = timed(iterrows_list_movies, path)
+            new_movies, new_list = timed(storage.list_movies)
+            assert new_movies == old_movies
+
+            print(f'{size:>9} {old_list:>8.2f}s {new_list:>8.2f}s '
+                  f'{old_list / new_list:>7.1f}x {old_save:>8.2f}s '
+                  f'{new_save:>8.2f}s {old_save / new_save:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Memory benchmark of MovieTable against the dictionary of dictionaries
+returned by list_movies. Run from the project root:
+
+    python -m benchmarks.bench_movie_table --sizes 10000 100000 1000000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_catalogue
+from storage.movie_table import MovieTable
+
+
+def traced(func, *args):
+    """Returns the result of the call, the bytes it kept allocated
+    and the seconds it took"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, seconds
+
+
+def scan_ratings(movies):
+    """Sums the ratings, the access pattern of the stats actions"""
+    return sum(movie['rating'] for movie in movies.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f'{"movies":>9} {"dicts":>10} {"table":>10} {"ratio":>6} '
+          f'{"dict scan":>10} {"table scan":>11}')
+    for size in args.sizes:
+        catalogue, dict_size, _ = traced(make_catalogue, size)
+        table, table_size, _ = traced(MovieTable, catalogue)
+        assert len(table) == len(catalogue)
+        _, _, dict_scan = traced(scan_ratings, catalogue)
+        _, _, table_scan = traced(scan_ratings, table)
+        print(f'{size:>9} {dict_size / size:>8.0f} B {table_size / size:>8.0f} B '
+              f'{dict_size / table_size:>5.1f}x {dict_scan:>9.3f}s '
+              f'{table_scan:>10.3f}s')
+        del catalogue, table
+
+
+if __name__ == '__main__':
+    main()
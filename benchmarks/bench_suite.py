@@ -0,0 +1,203 @@
+"""Benchmark suite of the storage operations and MovieApp actions on
+synthetic catalogues. Run from the project root:
+
+    python -m benchmarks.bench_suite --sizes 1000 100000 --output bench.json
+    python -m benchmarks.bench_suite --baseline bench.json
+
+Every storage operation and app action is run --repeats times, actions
+run headless with input() mocked and their output discarded. The report
+has the latency percentiles, throughput and peak traced memory of each, and
+with --baseline the p50 latencies are compared to a saved report and the
+run fails if one got slower than --tolerance times the baseline.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+from benchmarks.synthetic import make_catalogue
+from commands.web_gen import WebGenerator
+from main import create_storage
+from movie_app import MovieApp
+
+FORMATS = ('json', 'csv')
+STORAGE_OPERATIONS = ('open_list', 'iter_movies', 'add_movie',
+                      'update_movie', 'delete_movie', 'flush')
+ACTIONS = ('list', 'stats', 'search', 'sort', 'histogram', 'website')
+
+
+def summarize(latencies, peak_bytes) -> dict:
+    """Returns the statistics of a list of latencies in seconds"""
+    latencies = sorted(latencies)
+    quantiles = (statistics.quantiles(latencies, n=100, method='inclusive')
+                 if len(latencies) > 1 else latencies * 99)
+    return {'runs': len(latencies),
+            'p50_ms': quantiles[49] * 1000,
+            'p95_ms': quantiles[94] * 1000,
+            'p99_ms': quantiles[98] * 1000,
+            'max_ms': latencies[-1] * 1000,
+            'ops_per_s': len(latencies) / sum(latencies),
+            'peak_kb': peak_bytes / 1024}
+
+
+def measure(func, repeats) -> dict:
+    """Runs func(run) repeats times for the latencies, then once more with
+    tracemalloc for the peak memory, which would slow the timed runs"""
+    latencies = []
+    for run in range(repeats):
+        start = time.perf_counter()
+        func(run)
+        latencies.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(repeats)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize(latencies, peak)
+
+
+def bench_storage(path, catalogue, repeats) -> dict:
+    """Times the IStorage operations on a storage file"""
+    storage = create_storage(path)
+    titles = list(catalogue)
+
+    def new_movie(run):
+        key = f'benchmark movie {run}'
+        return {key: {'title': key.title(), 'rating': 7.0, 'year': 2000}}
+
+    operations = {
+        'open_list': lambda run: create_storage(path).list_movies(),
+        'iter_movies': lambda run: sum(1 for _ in storage.iter_movies()),
+        'add_movie': lambda run: storage.add_movie(new_movie(run)),
+        'update_movie': lambda run: storage.update_movie(
+            titles[run % len(titles)], f'note {run}'),
+        'delete_movie': lambda run: storage.delete_movie(
+            f'benchmark movie {run}'),
+        'flush': lambda run: storage.flush(),
+    }
+    return {name: measure(operations[name], repeats)
+            for name in STORAGE_OPERATIONS}
+
+
+def bench_actions(path, catalogue, repeats, work_dir) -> dict:
+    """Times the MovieApp actions on one app, so the first run of an
+    action pays for building its indexes. Every histogram run writes to a
+    new directory, otherwise the later runs would find the charts up to
+    date and skip rendering. Actions whose dependencies aren't installed
+    are reported as skipped."""
+    movie_app = MovieApp(create_storage(path))
+    query = next(iter(catalogue.values()))['title'].split()[0]
+
+    def generate_histogram(run):
+        chart_dir = os.path.join(work_dir, f'charts_{run}')
+        os.makedirs(chart_dir)
+        movie_app.generate_histogram(os.path.join(chart_dir, 'histogram'),
+                                     charts=('ratings', 'years'))
+
+    actions = {
+        'list': lambda run: movie_app.list_movies(),
+        'stats': lambda run: movie_app.stats(),
+        'search': lambda run: movie_app.search_movie(),
+        'sort': lambda run: movie_app.sort_movies(limit=20),
+        'histogram': generate_histogram,
+        'website': lambda run: movie_app.generate_website(),
+    }
+    results = {}
+    index_path = os.path.join(work_dir, 'index.html')
+    with mock.patch('builtins.input', return_value=query), \
+            mock.patch.object(WebGenerator, 'new_index_path', index_path), \
+            contextlib.redirect_stdout(io.StringIO()):
+        for name in ACTIONS:
+            try:
+                results[name] = measure(actions[name], repeats)
+            except ImportError as error:
+                results[name] = {'skipped': str(error)}
+    return results
+
+
+def run_suite(sizes, formats, repeats) -> dict:
+    """Runs the benchmarks and returns the report"""
+    report = {'python': sys.version.split()[0],
+              'platform': platform.platform(),
+              'repeats': repeats,
+              'results': {}}
+    for size in sizes:
+        catalogue = make_catalogue(size)
+        for storage_format in formats:
+            with tempfile.TemporaryDirectory() as work_dir:
+                path = os.path.join(work_dir, f'movies.{storage_format}')
+                storage = create_storage(path)
+                storage.add_movie(catalogue)
+                storage.flush()
+                prefix = f'{storage_format}/{size}'
+                for group, results in (
+                        ('storage', bench_storage(path, catalogue, repeats)),
+                        ('action', bench_actions(path, catalogue, repeats,
+                                                 work_dir))):
+                    for name, result in results.items():
+                        report['results'][f'{prefix}/{group}/{name}'] = result
+    return report
+
+
+def compare(report, baseline, tolerance) -> list:
+    """Returns the (name, baseline ms, current ms) of every result whose
+    p50 latency is more than tolerance times the baseline"""
+    regressions = []
+    for name, result in report['results'].items():
+        previous = baseline['results'].get(name, {})
+        if 'p50_ms' in result and 'p50_ms' in previous and \
+                result['p50_ms'] > previous['p50_ms'] * tolerance:
+            regressions.append((name, previous['p50_ms'], result['p50_ms']))
+    return regressions
+
+
+def print_report(report) -> None:
+    print(f'{"benchmark":<36} {"p50":>10} {"p95":>10} {"ops/s":>10} '
+          f'{"peak":>10}')
+    for name, result in report['results'].items():
+        if 'skipped' in result:
+            print(f'{name:<36} skipped: {result["skipped"]}')
+            continue
+        print(f'{name:<36} {result["p50_ms"]:>8.2f}ms '
+              f'{result["p95_ms"]:>8.2f}ms {result["ops_per_s"]:>10.1f} '
+              f'{result["peak_kb"]:>8.0f}KB')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1_000, 10_000, 100_000])
+    parser.add_argument('--formats', nargs='+', choices=FORMATS,
+                        default=list(FORMATS))
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', help='write the json report to a file')
+    parser.add_argument('--baseline', help='json report to compare with')
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    args = parser.parse_args()
+
+    report = run_suite(args.sizes, args.formats, args.repeats)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(json.dumps(report, indent=4))
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            regressions = compare(report, json.loads(file.read()),
+                                  args.tolerance)
+        for name, previous, current in regressions:
+            print(f'Regression in {name}: {previous:.2f}ms -> '
+                  f'{current:.2f}ms')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
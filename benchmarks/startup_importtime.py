@@ -0,0 +1,71 @@
+"""Startup benchmark of the app imports, using python -X importtime.
+Run from the project root:
+
+    python -m benchmarks.startup_importtime --max-ms 150
+
+Prints the total import time of main.py and its slowest imports. Exits with
+an error if an import that should be lazy is loaded at startup, or if the
+total is above --max-ms, so CI can track regressions.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).parent.parent
+LAZY_MODULES = ('matplotlib', 'pandas', 'numpy', 'thefuzz', 'requests',
+                'pycountry', 'aiohttp', 'cProfile')
+
+
+def measure_imports(module='main'):
+    """Imports the module in a new interpreter and returns a dict of the
+    imported module names and their cumulative import times in us"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT_PATH, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='imports to run, the fastest is reported')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--max-ms', type=float,
+                        help='fail if the import takes longer')
+    parser.add_argument('--json', dest='json_path',
+                        help='also write the results to this json file')
+    args = parser.parse_args()
+
+    runs = [measure_imports(args.module) for _ in range(args.runs)]
+    times = min(runs, key=lambda run: run[args.module])
+    total_ms = times[args.module] / 1000
+    print(f'import {args.module}: {total_ms:.1f} ms')
+    slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)
+    for name, cumulative in slowest[1:args.top + 1]:
+        print(f'{cumulative / 1000:>9.1f} ms  {name}')
+
+    eager = sorted({name for name in times
+                    if name.split('.')[0] in LAZY_MODULES})
+    if args.json_path:
+        with open(args.json_path, 'w') as file:
+            json.dump({'module': args.module, 'total_ms': total_ms,
+                       'eager_modules': eager,
+                       'imports_us': dict(slowest)}, file, indent=4)
+    if eager:
+        sys.exit(f'Loaded at startup, should be lazy: {", ".join(eager)}')
+    if args.max_ms is not None and total_ms > args.max_ms:
+        sys.exit(f'Startup import took {total_ms:.1f} ms, '
+                 f'more than {args.max_ms} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Local stub of the OMDb API, so API clients can be tested and measured
+without network access. Titles starting with 'missing' aren't found,
+'broken' titles get an invalid json body, 'unrated' titles have no
+rating, 'series' titles have a range of years and 'nowhere' titles a
+country that doesn't exist."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubOmdbHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a movie named after the 't' parameter"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        title = parse_qs(urlparse(self.path).query).get('t', [''])[0]
+        if title.startswith('missing'):
+            data = {'Response': 'False', 'Error': 'Movie not found!'}
+        else:
+            data = {'Title': title, 'Year': '2001', 'imdbRating': '7.5',
+                    'Genre': 'Drama', 'Director': 'Jane Doe',
+                    'Country': 'United States', 'imdbID': 'tt0000001',
+                    'Poster': 'https://example.com/poster.jpg',
+                    'Response': 'True'}
+            if title.startswith('unrated'):
+                data['imdbRating'] = 'N/A'
+            elif title.startswith('series'):
+                data['Year'] = '2011\u20132013'
+            elif title.startswith('nowhere'):
+                data['Country'] = 'Atlantis'
+        body = json.dumps(data).encode()
+        if title.startswith('broken'):
+            body = body[:-1]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server():
+    """Starts the stub server on a free local port in a daemon thread,
+    returns the server and its api url"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubOmdbHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/'
@@ -0,0 +1,46 @@
+"""Synthetic movie catalogues for the benchmarks"""
+import random
+
+GENRES = ['Action', 'Adventure', 'Animation', 'Biography', 'Comedy', 'Crime',
+          'Drama', 'Family', 'Fantasy', 'History', 'Horror', 'Music',
+          'Mystery', 'Romance', 'Sci-Fi', 'Thriller', 'War', 'Western']
+COUNTRIES = [('United States', 'US'), ('United Kingdom', 'GB'),
+             ('France', 'FR'), ('Japan', 'JP'), ('India', 'IN'),
+             ('Germany', 'DE'), ('Italy', 'IT'), ('South Korea', 'KR'),
+             ('Canada', 'CA'), ('Spain', 'ES')]
+WORDS = ['the', 'last', 'night', 'king', 'love', 'dark', 'city', 'man',
+         'story', 'war', 'star', 'return', 'dead', 'secret', 'life', 'house',
+         'blood', 'girl', 'world', 'time', 'lost', 'day', 'black', 'river',
+         'game', 'summer', 'ghost', 'road', 'heart', 'island']
+FIRST_NAMES = ['James', 'Maria', 'Akira', 'Sofia', 'Ingmar', 'Agnes',
+               'Satyajit', 'Kathryn', 'Bong', 'Federico', 'Greta', 'Wong']
+LAST_NAMES = ['Smith', 'Kurosawa', 'Varda', 'Bergman', 'Ray', 'Bigelow',
+              'Fellini', 'Gerwig', 'Kar-wai', 'Joon-ho', 'Nolan', 'Campion']
+
+
+def make_movie(rng, index):
+    """Returns a (key, movie dict) pair with realistic looking fields"""
+    title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+    title = f'{title.title()} {index}'
+    country, alpha_2 = rng.choice(COUNTRIES)
+    movie = {
+        'title': title,
+        'rating': round(min(10.0, max(1.0, rng.gauss(6.5, 1.2))), 1),
+        'year': rng.randint(1920, 2024),
+        'genre': ', '.join(rng.sample(GENRES, rng.randint(1, 3))),
+        'img': f'https://m.media-amazon.com/images/M/MV5B{index:09d}'
+               f'@._V1_SX300.jpg',
+        'director': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'country': country,
+        'alpha_2': alpha_2,
+        'imdbID': f'tt{index:07d}',
+    }
+    if rng.random() < 0.1:
+        movie['note'] = 'Watch again with friends'
+    return title.lower(), movie
+
+
+def make_catalogue(size, seed=0):
+    """Returns a dictionary of dictionaries with size synthetic movies"""
+    rng = random.Random(seed)
+    return dict(make_movie(rng, index) for index in range(size))
@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+NOT_FOUND_ERROR = 'Movie not found!'
+
+
+class ApiResponseCache:
+    """Persistent cache of raw API responses, stored in a sqlite file.
+
+    Responses are saved under the normalised title that was looked up, the
+    normalised title from the response and its imdbID. Every entry expires
+    after ttl seconds, 'not found' responses after negative_ttl seconds, and
+    the least recently used entries are evicted above max_entries. Other
+    errors, like a reached request limit, aren't cached as they may pass.
+    Lookups are counted in hits and misses.
+    """
+    default_path = os.path.join(Path(__file__).parent.parent, ".cache",
+                                "omdb_responses.sqlite")
+
+    def __init__(self, file_path=default_path, ttl=7 * 24 * 3600,
+                 negative_ttl=24 * 3600, max_entries=10000):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._accessed = {}
+        self.hits = 0
+        self.misses = 0
+        self._connection = sqlite3.connect(file_path,
+                                           check_same_thread=False)
+        with self._connection:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY, payload TEXT,
+                    expires REAL, last_access REAL)''')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS responses_last_access '
+                'ON responses (last_access)')
+
+    @staticmethod
+    def normalise_title(title: str) -> str:
+        """Returns the title lowercase with single spaces between words"""
+        return ' '.join(title.lower().split())
+
+    def lookup(self, key: str):
+        """Returns the cached payload of the key or None, counting the
+        lookup as a hit or a miss. Access times are kept in memory and
+        saved with the next write."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT payload, expires FROM responses WHERE key = ?',
+                (key,)).fetchone()
+            if row is None or row[1] < time.time():
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._accessed[key] = time.time()
+            return json.loads(row[0])
+
+    def get(self, title: str):
+        """Returns the cached API response of the title or None"""
+        return self.lookup('t:' + self.normalise_title(title))
+
+    def get_by_id(self, imdb_id: str):
+        """Returns the cached API response of the imdbID or None"""
+        return self.lookup('id:' + imdb_id)
+
+    def put(self, title: str, payload: dict) -> None:
+        """Saves the API response of the looked up title, and evicts the
+        least recently used entries if the cache is full. Error responses
+        other than 'not found' aren't saved."""
+        now = time.time()
+        keys = {'t:' + self.normalise_title(title)}
+        if 'Error' in payload:
+            if payload['Error'] != NOT_FOUND_ERROR:
+                return
+            expires = now + self._negative_ttl
+        else:
+            expires = now + self._ttl
+            if payload.get('Title'):
+                keys.add('t:' + self.normalise_title(payload['Title']))
+            if payload.get('imdbID'):
+                keys.add('id:' + payload['imdbID'])
+
+        text = json.dumps(payload)
+        with self._lock, self._connection:
+            self.save_access_times()
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+                [(key, text, expires, now) for key in keys])
+            self._connection.execute(
+                'DELETE FROM responses WHERE key IN (SELECT key FROM '
+                'responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                (self._max_entries,))
+
+    def save_access_times(self) -> None:
+        """Writes the access times of the hits since the last write"""
+        self._connection.executemany(
+            'UPDATE responses SET last_access = ? WHERE key = ?',
+            [(accessed, key) for key, accessed in self._accessed.items()])
+        self._accessed.clear()
+
+    def close(self) -> None:
+        """Saves pending access times and closes the cache file"""
+        with self._lock, self._connection:
+            self.save_access_times()
+        self._connection.close()
+
+    def stats(self) -> dict:
+        """Returns the amount of hits and misses and the hit ratio"""
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0}
@@ -1,14 +1,20 @@
 from os import environ
+from urllib.parse import urlparse
 import requests
-import pycountry
+from .country_resolver import country_resolver
 
 
 class MovieAPIRequest:
     """Movie API request class, gets movie from the API request
     and handles any errors."""
-    def __init__(self):
+    api_url = 'http://www.omdbapi.com/'
+
+    def __init__(self, rate_limiter=None, api_url=api_url, cache=None):
         self._api_key = '292ab885'
-        self._api_ep = f'http://www.omdbapi.com/?apikey={self._api_key}&t='
+        self._api_ep = f'{api_url}?apikey={self._api_key}&t='
+        self._api_host = urlparse(api_url).netloc
+        self._rate_limiter = rate_limiter
+        self._cache = cache
 
     def get_movie_data(self, title: str) -> dict:
         """Gets a movie title and tries to fetch movie data from api.
@@ -18,41 +24,61 @@ class MovieAPIRequest:
             data = self.get_request_from_api(title)
         except requests.exceptions.ConnectionError:
             return {'error': 'Connection error'}
+        except ValueError:
+            return {'error': 'Invalid response'}
 
+        return self.parse_movie_data(data)
+
+    @staticmethod
+    def parse_movie_data(data: dict) -> dict:
+        """Takes the api response data of a movie and returns a dict of the
+        extracted data, or a dict with "error" as key if the movie wasn't
+        found or has no rating. Series years like '2011–2013' are stored as
+        their first year."""
         if 'Error' in data:
             return {'error': 'Movie not found!'}
 
         try:
+            title = data['Title']
             rating = float(data.get('imdbRating'))
-        except ValueError:
-            rating = data.get('imdbRating')
-
-        else:
-            return {data.get('Title').lower(): {
-                'title': data.get('Title'),
-                'rating': rating,
-                'year': int(data.get('Year')),
-                'genre': data.get('Genre'),
-                'img': data.get('Poster'),
-                'director': data.get('Director'),
-                'country': data.get('Country'),
-                'alpha_2': self.get_country_alpha_2(data.get('Country')),
-                'imdbID': data.get('imdbID')
-            }}
+            year = int(data.get('Year')[:4])
+        except (KeyError, TypeError, ValueError):
+            return {'error': 'Invalid movie data'}
+
+        return {title.lower(): {
+            'title': title,
+            'rating': rating,
+            'year': year,
+            'genre': data.get('Genre'),
+            'img': data.get('Poster'),
+            'director': data.get('Director'),
+            'country': data.get('Country'),
+            'alpha_2': MovieAPIRequest.get_country_alpha_2(
+                data.get('Country')),
+            'imdbID': data.get('imdbID')
+        }}
 
     def get_request_from_api(self, title: str):
-        """Send a GET requests to API and returns response in json format"""
+        """Send a GET requests to API and returns response in json format.
+        If a response cache is set, cached responses are returned without
+        a request and new ones are saved to it."""
+        if self._cache is not None:
+            data = self._cache.get(title)
+            if data is not None:
+                return data
+
         url = self._api_ep + title
+        if self._rate_limiter is not None:
+            self._rate_limiter.wait(self._api_host)
         response = requests.get(url, timeout=3)
-        return response.json()
+        data = response.json()
+        if self._cache is not None:
+            self._cache.put(title, data)
+        return data
 
     @staticmethod
     def get_country_alpha_2(country_name: str) -> str:
         """Takes countries names from api response, and returns
         the 2-letter code of the first country
         """
-        if ',' in country_name:
-            countries_list = country_name.split(',')
-            country_name = countries_list[0].strip()
-        country = pycountry.countries.search_fuzzy(country_name)
-        return country[0].alpha_2
+        return country_resolver.resolve_first(country_name)
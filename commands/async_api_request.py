@@ -0,0 +1,76 @@
+import asyncio
+import random
+import aiohttp
+from .api_request import MovieAPIRequest
+
+
+class AsyncMovieAPIRequest:
+    """Asyncio movie API request class, sends all requests through one
+    pooled keep-alive session. Results have the same shape as
+    MovieAPIRequest.get_movie_data, errors included. Use it as an async
+    context manager:
+
+        async with AsyncMovieAPIRequest() as api_request:
+            movies = await api_request.get_many(titles)
+    """
+    def __init__(self, api_url=MovieAPIRequest.api_url, max_concurrency=10,
+                 retries=3, backoff=0.5, timeout=3):
+        self._api_key = '292ab885'
+        self._api_url = api_url
+        self._max_concurrency = max_concurrency
+        self._retries = retries
+        self._backoff = backoff
+        self._timeout = timeout
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self._max_concurrency)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self._timeout))
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    async def get_request_from_api(self, title: str) -> dict:
+        """Sends a GET request to the API and returns the response json"""
+        params = {'apikey': self._api_key, 't': title}
+        async with self._session.get(self._api_url, params=params) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def get_movie_data(self, title: str) -> dict:
+        """Gets a movie title and tries to fetch movie data from api,
+        retrying failed requests with jittered exponential backoff.
+        Returns a dict of extracted data, if there is an error the function
+        returns a dict with "error" as key and the error as it's value.
+        The response is parsed in a worker thread, as resolving its country
+        may load pycountry and would block the event loop."""
+        for attempt in range(self._retries + 1):
+            try:
+                async with self._semaphore:
+                    data = await self.get_request_from_api(title)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self._retries:
+                    return {'error': 'Connection error'}
+                delay = self._backoff * 2 ** attempt
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+            except ValueError:
+                return {'error': 'Invalid response'}
+        return await asyncio.to_thread(MovieAPIRequest.parse_movie_data, data)
+
+    async def get_many(self, titles: list) -> dict:
+        """Fetches all titles concurrently, at most max_concurrency at a
+        time, and returns a dict of each title and its result. A title that
+        fails unexpectedly gets an "error" result instead of failing the
+        others."""
+        results = await asyncio.gather(
+            *(self.get_movie_data(title) for title in titles),
+            return_exceptions=True)
+        return {title: {'error': f'{type(result).__name__}: {result}'}
+                if isinstance(result, Exception) else result
+                for title, result in zip(titles, results)}
@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .api_request import MovieAPIRequest
+
+
+class RateLimiter:
+    """Thread safe rate limiter, spaces out calls to the same host so that
+    there are at most calls_per_second of them"""
+    def __init__(self, calls_per_second: float):
+        self._interval = 1 / calls_per_second
+        self._lock = threading.Lock()
+        self._next_call = {}
+
+    def wait(self, host: str) -> None:
+        """Blocks until the next call to the host is allowed"""
+        with self._lock:
+            now = time.monotonic()
+            call_time = max(now, self._next_call.get(host, now))
+            self._next_call[host] = call_time + self._interval
+        if call_time > now:
+            time.sleep(call_time - now)
+
+
+class BulkImporter:
+    """Bulk importer class, fetches many movie titles from the API at once
+    and saves all fetched movies to the storage in a single write"""
+    def __init__(self, storage, max_workers: int = 8,
+                 calls_per_second: float = 10, cache=None):
+        self.storage = storage
+        self.max_workers = max_workers
+        self.api_request = MovieAPIRequest(
+            rate_limiter=RateLimiter(calls_per_second), cache=cache)
+
+    @staticmethod
+    def read_titles(lines) -> list:
+        """Takes lines of a titles file and returns the titles, skipping
+        empty lines, '#' comments and repeated titles"""
+        titles = {}
+        for line in lines:
+            title = line.strip()
+            if title and not title.startswith('#'):
+                titles.setdefault(title.lower(), title)
+        return list(titles.values())
+
+    def fetch_movie(self, title: str) -> dict:
+        """Fetches a single title, returns the movie data dict or a dict
+        with "error" as key so one bad title doesn't stop the batch"""
+        try:
+            movie_dict = self.api_request.get_movie_data(title)
+        except Exception as error:
+            return {'error': f'{type(error).__name__}: {error}'}
+        if movie_dict is None:
+            return {'error': 'Invalid movie data'}
+        return movie_dict
+
+    def import_titles(self, titles: list) -> tuple:
+        """Fetches the titles that aren't stored yet with a thread pool and
+        adds them to the storage in one write. Returns a dict of the added
+        movies, a dict of the failed titles and their errors and a list of
+        the titles whose movie was already stored or imported. A movie the
+        API returns under a stored key, e.g. 'matrix' for 'the matrix',
+        isn't added again, so its note is kept."""
+        movies = self.storage.list_movies()
+        existing = [title for title in titles if title.lower() in movies]
+        titles = [title for title in titles if title.lower() not in movies]
+
+        new_movies = {}
+        failures = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(self.fetch_movie, titles)
+            for title, movie_dict in zip(titles, results):
+                if movie_dict.get('error'):
+                    failures[title] = movie_dict['error']
+                    continue
+                for key, movie in movie_dict.items():
+                    if key in movies or key in new_movies:
+                        existing.append(title)
+                    else:
+                        new_movies[key] = movie
+
+        if new_movies:
+            self.storage.add_movie(new_movies)
+        return new_movies, failures, existing
@@ -0,0 +1,186 @@
+import inspect
+import json
+import shlex
+import sys
+
+
+class CommandError(Exception):
+    """Error of a single command, reported in its result line"""
+
+
+class CommandRunner:
+    """Runs movie app commands without the menu, e.g. from a script file.
+    Each line is a command with shell-like quoted arguments:
+
+        add "The Matrix"
+        update "the matrix" "Watch again"
+        search matrix
+        top 10
+
+    All commands run inside one storage batch, so many changes are saved
+    together, and each command writes one json result line to the stream.
+    A malformed line or a failed command only fails its own result line.
+    If the batch is aborted, e.g. by Ctrl+C or an unexpected error, the
+    changes made so far are still saved on every storage, an "aborted"
+    result line is written and the error is raised again.
+    """
+    USAGE = {
+        'add': 'add TITLE',
+        'delete': 'delete TITLE',
+        'update': 'update TITLE NOTE',
+        'get': 'get TITLE',
+        'search': 'search QUERY',
+        'top': 'top [LIMIT]',
+        'stats': 'stats',
+        'list': 'list',
+    }
+
+    def __init__(self, movie_app, stream=None):
+        self.movie_app = movie_app
+        self.storage = movie_app.storage
+        self.stream = stream or sys.stdout
+        self.commands = {
+            'add': self.add_movie,
+            'delete': self.delete_movie,
+            'update': self.update_movie,
+            'get': self.get_movie,
+            'search': self.search_movies,
+            'top': self.top_movies,
+            'stats': self.stats,
+            'list': self.list_movies,
+        }
+
+    def run(self, lines) -> tuple:
+        """Runs the command lines in one storage batch and writes a result
+        line per command. Returns the numbers of succeeded and failed
+        commands"""
+        succeeded = failed = 0
+        aborted = None
+        # The batch always ends normally, so sqlite commits the changes of
+        # an aborted batch like the other storages instead of rolling back
+        with self.storage.batch():
+            for line in lines:
+                try:
+                    result = self.run_command(line)
+                except (Exception, KeyboardInterrupt) as error:
+                    aborted = error
+                    break
+                if result is None:
+                    continue
+                self.write_result(result)
+                if result['ok']:
+                    succeeded += 1
+                else:
+                    failed += 1
+        if aborted is not None:
+            self.write_result({'ok': False, 'aborted': True,
+                               'error': f"{type(aborted).__name__}: "
+                                        f"{aborted}"})
+            self.stream.flush()
+            raise aborted
+        self.stream.flush()
+        return succeeded, failed
+
+    def write_result(self, result) -> None:
+        # Compact storages return movie mappings instead of dicts
+        self.stream.write(json.dumps(result, default=dict) + '\n')
+
+    def run_command(self, line: str):
+        """Runs the command of a line, returns its result dict with "ok" set
+        to False and the "error" if it failed, or None for empty lines and
+        '#' comments"""
+        try:
+            words = shlex.split(line, comments=True)
+        except ValueError as error:
+            return {'line': line.rstrip('\n'), 'ok': False,
+                    'error': f"Invalid line: {error}"}
+        if not words:
+            return None
+        name, args = words[0].lower(), words[1:]
+        result = {'command': name, 'args': args}
+        try:
+            if name not in self.commands:
+                raise CommandError(f"Unknown command '{name}', commands: "
+                                   f"{', '.join(self.commands)}")
+            command = self.commands[name]
+            try:
+                inspect.signature(command).bind(*args)
+            except TypeError:
+                raise CommandError(f"Usage: {self.USAGE[name]}") from None
+            result.update(command(*args))
+        except CommandError as error:
+            result.update(ok=False, error=str(error))
+        else:
+            result['ok'] = True
+        return result
+
+    @staticmethod
+    def get_rows(movies) -> list:
+        """Returns the movies dict as a list of movie dicts with their key"""
+        return [{'key': key, **movie} for key, movie in movies.items()]
+
+    def find_movie(self, title: str) -> tuple:
+        """Returns the key and movie dict of the title, raises CommandError
+        if it doesn't exist"""
+        movie_name = title.lower()
+        movie = self.storage.get_movie(movie_name)
+        if movie is None:
+            raise CommandError(f"Movie '{movie_name}' doesn't exist!")
+        return movie_name, movie
+
+    def add_movie(self, title: str) -> dict:
+        movie_name = title.lower()
+        if self.storage.get_movie(movie_name) is not None:
+            raise CommandError(f"Movie '{movie_name}' already exists")
+        # Loads requests and pycountry only when a movie is added
+        from .api_request import MovieAPIRequest
+        movie_api_request = MovieAPIRequest(cache=self.movie_app.api_cache)
+        try:
+            new_movie_dict = movie_api_request.get_movie_data(movie_name)
+        except ValueError as error:
+            raise CommandError(f"Invalid movie data: {error}") from None
+        if not isinstance(new_movie_dict, dict) or not new_movie_dict:
+            raise CommandError("Invalid movie data")
+        if new_movie_dict.get('error'):
+            raise CommandError(new_movie_dict['error'])
+        self.storage.add_movie(new_movie_dict)
+        self.movie_app.update_indexes(changed=new_movie_dict)
+        return {'movies': self.get_rows(new_movie_dict)}
+
+    def delete_movie(self, title: str) -> dict:
+        movie_name, _ = self.find_movie(title)
+        self.storage.delete_movie(movie_name)
+        self.movie_app.update_indexes(deleted=[movie_name])
+        return {}
+
+    def update_movie(self, title: str, note: str) -> dict:
+        movie_name, _ = self.find_movie(title)
+        self.storage.update_movie(movie_name, note)
+        movie = self.storage.get_movie(movie_name)
+        self.movie_app.update_indexes(changed={movie_name: movie})
+        return {'movies': self.get_rows({movie_name: movie})}
+
+    def get_movie(self, title: str) -> dict:
+        movie_name, movie = self.find_movie(title)
+        return {'movies': self.get_rows({movie_name: movie})}
+
+    def search_movies(self, query: str) -> dict:
+        return {'movies': self.get_rows(
+            self.movie_app.find_movies(query.lower()))}
+
+    def top_movies(self, limit='10') -> dict:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise CommandError(f"Limit '{limit}' is not a number") from None
+        return {'movies': self.get_rows(
+            self.movie_app.get_sorted_movies(limit=max(limit, 0)))}
+
+    def stats(self) -> dict:
+        summary = self.movie_app.get_stats_summary()
+        if summary is None:
+            raise CommandError("No rated movies to analyze.")
+        return {'stats': summary}
+
+    def list_movies(self) -> dict:
+        return {'movies': self.get_rows(dict(self.storage.iter_movies()))}
@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+# Names OMDb uses that aren't names of current ISO countries
+COUNTRY_ALIASES = {
+    'uk': 'GB', 'usa': 'US', 'west germany': 'DE', 'east germany': 'DE',
+    'soviet union': 'RU', 'russia': 'RU', 'south korea': 'KR',
+    'north korea': 'KP', 'korea': 'KR', 'iran': 'IR', 'vietnam': 'VN',
+    'taiwan': 'TW', 'czech republic': 'CZ', 'czechoslovakia': 'CZ',
+    'yugoslavia': 'RS', 'federal republic of yugoslavia': 'RS',
+    'serbia and montenegro': 'RS', 'bolivia': 'BO', 'venezuela': 'VE',
+    'syria': 'SY', 'laos': 'LA', 'tanzania': 'TZ', 'moldova': 'MD',
+    'turkey': 'TR', 'hong kong': 'HK', 'macao': 'MO', 'palestine': 'PS',
+    'occupied palestinian territory': 'PS', 'ivory coast': 'CI',
+    'republic of north macedonia': 'MK', 'cape verde': 'CV',
+    'swaziland': 'SZ', 'burma': 'MM', 'zaire': 'CD',
+    'democratic republic of the congo': 'CD', 'republic of the congo': 'CG',
+}
+
+
+class CountryResolver:
+    """Country resolver class, converts country names to 2-letter codes.
+
+    Names are looked up in a table of the exact, common and official ISO
+    names, the ISO codes and COUNTRY_ALIASES. The table is built from
+    pycountry once and saved to table_path, so later runs don't load
+    pycountry at all. Only names missing from the table go through
+    pycountry's fuzzy search, and their results are added to the table.
+    """
+    default_table_path = os.path.join(Path(__file__).parent.parent, ".cache",
+                                      "country_codes.json")
+
+    def __init__(self, table_path=default_table_path):
+        self._table_path = table_path
+        self._table = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def build_table() -> dict:
+        """Returns a dict of lowercase country names and codes and their
+        2-letter code, built from the pycountry database"""
+        import pycountry
+
+        table = {}
+        for country in pycountry.countries:
+            for attribute in ('alpha_2', 'alpha_3', 'official_name',
+                              'common_name', 'name'):
+                value = getattr(country, attribute, None)
+                if value:
+                    table[value.lower()] = country.alpha_2
+        table.update(COUNTRY_ALIASES)
+        return table
+
+    def get_table(self) -> dict:
+        """Returns the lookup table, loading or building it on first use"""
+        if self._table is None:
+            with self._lock:
+                try:
+                    with open(self._table_path, 'r') as file:
+                        self._table = json.loads(file.read())
+                except (OSError, ValueError):
+                    self._table = self.build_table()
+                    self.save_table()
+        return self._table
+
+    def save_table(self) -> None:
+        """Saves the lookup table to the table file"""
+        os.makedirs(os.path.dirname(self._table_path), exist_ok=True)
+        tmp_path = self._table_path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            file.write(json.dumps(self._table))
+        os.replace(tmp_path, self._table_path)
+
+    def resolve(self, country_name: str) -> str:
+        """Returns the 2-letter code of a single country name, raises
+        LookupError if the country can't be found"""
+        table = self.get_table()
+        key = country_name.strip().lower()
+        if key not in table:
+            import pycountry
+
+            alpha_2 = pycountry.countries.search_fuzzy(country_name)[0].alpha_2
+            with self._lock:
+                table[key] = alpha_2
+                self.save_table()
+        return table[key]
+
+    def resolve_all(self, countries: str) -> list:
+        """Takes a comma separated countries string from the API and returns
+        the 2-letter codes of all the countries"""
+        return [self.resolve(country) for country in countries.split(',')]
+
+    def resolve_first(self, countries: str) -> str:
+        """Takes a comma separated countries string from the API and returns
+        the 2-letter code of the first country"""
+        return self.resolve(countries.split(',')[0])
+
+
+country_resolver = CountryResolver()
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+from array import array
+from collections import Counter
+
+CHARTS = ('ratings', 'years', 'genres')
+RATING_BINS = range(10)
+MANIFEST_NAME = '.histograms.json'
+CHART_LABELS = {'ratings': ('Ratings', 'Amount of Movies'),
+                'years': ('Years', 'Amount of Movies'),
+                'genres': ('Genres', 'Amount of Movies')}
+
+
+class HistogramGenerator:
+    """Headless chart generator for the movies catalogue.
+
+    Draws with matplotlib's object oriented Agg API instead of pyplot, so no
+    window backend is loaded and every figure is released after saving.
+    The counts of all requested charts are collected in a single pass over
+    the movies and binned with numpy. A hash of each chart's counts is kept
+    with the modification time and size of its PNG in a manifest next to
+    the PNG, and a chart whose counts and PNG didn't change isn't rendered
+    again.
+    """
+    def __init__(self, output_dir='.'):
+        self.output_dir = output_dir
+        self._manifests = {}
+
+    def get_manifest(self, path: str) -> dict:
+        """Returns the manifest of the directory of the png path, a dict of
+        the png file names and their chart hash and file stamp"""
+        manifest_path = os.path.join(os.path.dirname(path), MANIFEST_NAME)
+        if manifest_path not in self._manifests:
+            try:
+                with open(manifest_path, 'r') as file:
+                    self._manifests[manifest_path] = json.load(file)
+            except (OSError, ValueError):
+                self._manifests[manifest_path] = {}
+        return self._manifests[manifest_path]
+
+    def save_manifests(self) -> None:
+        for manifest_path, manifest in self._manifests.items():
+            with open(manifest_path, 'w') as file:
+                json.dump(manifest, file, indent=4)
+
+    @staticmethod
+    def get_file_stamp(path: str):
+        """Returns the modification time and size of the file, None if it
+        doesn't exist"""
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            return None
+        return [file_stat.st_mtime_ns, file_stat.st_size]
+
+    def get_path(self, chart: str, file_name: str) -> str:
+        """Returns the png path of the chart, the ratings chart keeps the
+        plain file name"""
+        if chart != 'ratings':
+            file_name = f'{file_name}_{chart}'
+        return os.path.join(self.output_dir, f'{file_name}.png')
+
+    @staticmethod
+    def collect_counts(movies, charts=CHARTS, rating_counts=None) -> dict:
+        """Takes (key, movie) pairs and returns the (bins, counts) of each
+        chart. Ratings and years are binned in one numpy call each, years
+        by decade, and genres are counted by name. If rating_counts are
+        given, e.g. from the storage, ratings aren't collected."""
+        import numpy as np
+        ratings = array('d')
+        years = array('l')
+        genres = Counter()
+        collect_ratings = 'ratings' in charts and rating_counts is None
+        if collect_ratings or 'years' in charts or 'genres' in charts:
+            for _, movie in movies:
+                if collect_ratings and 'rating' in movie:
+                    ratings.append(movie['rating'])
+                if isinstance(movie.get('year'), int):
+                    years.append(movie['year'])
+                if movie.get('genre'):
+                    genres.update(name.strip()
+                                  for name in movie['genre'].split(','))
+
+        counts = {}
+        if 'ratings' in charts:
+            if rating_counts is None:
+                rating_counts = np.histogram(ratings, bins=RATING_BINS)[0]
+            counts['ratings'] = (list(RATING_BINS),
+                                 [int(count) for count in rating_counts])
+        if 'years' in charts:
+            decades = np.asarray(years) // 10 * 10
+            bins = list(range(int(decades.min()), int(decades.max()) + 11,
+                              10)) if len(decades) else [0, 10]
+            year_counts = np.histogram(years, bins=bins)[0]
+            counts['years'] = (bins, [int(count) for count in year_counts])
+        if 'genres' in charts:
+            names = sorted(genres, key=genres.get, reverse=True)
+            counts['genres'] = (names, [genres[name] for name in names])
+        return counts
+
+    @staticmethod
+    def get_hash(chart: str, bins: list, counts: list) -> str:
+        return hashlib.sha256(
+            json.dumps([chart, bins, counts]).encode()).hexdigest()
+
+    @staticmethod
+    def render(chart: str, bins: list, counts: list, path: str) -> None:
+        """Draws the chart on its own Agg canvas and saves it as png"""
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot()
+        if chart == 'genres':
+            axes.bar(bins, counts)
+            axes.tick_params(axis='x', labelrotation=90)
+        else:
+            axes.hist(bins[:-1], bins=bins, weights=counts)
+        x_label, y_label = CHART_LABELS[chart]
+        axes.set_xlabel(x_label)
+        axes.set_ylabel(y_label)
+        figure.tight_layout()
+        figure.savefig(path)
+
+    def generate(self, movies, charts=('ratings',), file_name='histogram',
+                 rating_counts=None) -> dict:
+        """Writes the png of each chart and returns a dict of the paths and
+        whether the chart was rendered, False when it was up to date"""
+        results = {}
+        for chart, (bins, counts) in self.collect_counts(
+                movies, charts, rating_counts).items():
+            path = self.get_path(chart, file_name)
+            manifest = self.get_manifest(path)
+            entry = {'hash': self.get_hash(chart, bins, counts)}
+            name = os.path.basename(path)
+            if manifest.get(name) == {**entry,
+                                      'stamp': self.get_file_stamp(path)}:
+                results[path] = False
+                continue
+            self.render(chart, bins, counts, path)
+            manifest[name] = {**entry, 'stamp': self.get_file_stamp(path)}
+            results[path] = True
+        self.save_manifests()
+        return results
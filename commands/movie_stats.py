@@ -1,17 +1,50 @@
+from array import array
+
+
 class MovieStats:
-    """Movies stats analyzer based on the provided movies data"""
+    """Movies stats analyzer based on the provided movies data.
+    Takes a dict of movie dicts or any iterable of movie dicts, such as a
+    storage cursor, and reads it in a single pass. Movies sharing a title
+    are listed once in the best and worst movies."""
     def __init__(self, movies_data):
-        self.movies = movies_data
-        self.ratings = self.get_ratings()
-        self.average = self.average_rating(list(self.ratings.values()))
-        self.median = self.median_rating(list(self.ratings.values()))
-        self.best_movies = self.get_best_movies(self.ratings)
-        self.worst_movies = self.get_worst_movies(self.ratings)
+        if isinstance(movies_data, dict):
+            movies_data = movies_data.values()
+        ratings = array('d')
+        total = 0.0
+        best_rating = worst_rating = None
+        self.best_movies = []
+        self.worst_movies = []
+        for movie in movies_data:
+            rating = movie['rating']
+            ratings.append(rating)
+            total += rating
+            if best_rating is None or rating > best_rating:
+                best_rating = rating
+                self.best_movies = [movie['title']]
+            elif rating == best_rating:
+                self.best_movies.append(movie['title'])
+            if worst_rating is None or rating < worst_rating:
+                worst_rating = rating
+                self.worst_movies = [movie['title']]
+            elif rating == worst_rating:
+                self.worst_movies.append(movie['title'])
+        self.best_movies = list(dict.fromkeys(self.best_movies))
+        self.worst_movies = list(dict.fromkeys(self.worst_movies))
+        self.count = len(ratings)
+        self.average = total / self.count
+        self.median = self.median_rating(ratings)
 
-    def get_ratings(self):
-        """Returns a dict with movie titles as keys
-        and their rating as values"""
-        return {val['title']: val['rating'] for val in self.movies.values()}
+    @classmethod
+    def from_summary(cls, average, median, best_movies, worst_movies):
+        """Creates stats from values that were already computed, for example
+        by a storage that can aggregate the ratings itself.
+        """
+        movie_stats = cls.__new__(cls)
+        movie_stats.average = average
+        movie_stats.median = median
+        movie_stats.best_movies = best_movies
+        movie_stats.worst_movies = worst_movies
+        return movie_stats
 
     def __str__(self):
         """Prints current statistics of provided movie data"""
@@ -22,37 +55,18 @@ class MovieStats:
         return output
 
     @staticmethod
-    def average_rating(ratings: list) -> float:
-        """Takes a list of ratings and returns the average rating"""
-        sum_ratings = 0
-        for rating in ratings:
-            sum_ratings += rating
-        return sum_ratings / len(ratings)
-
-    @staticmethod
-    def median_rating(ratings: list) -> float:
-        """Takes a list of ratings and returns the median rating"""
-        ratings.sort()
-        mid = len(ratings) // 2
-        if len(ratings) % 2 == 0:
-            return MovieStats.average_rating(ratings[mid - 1:mid + 1])
-        return ratings[mid]
-
-    @staticmethod
-    def get_best_movies(movies_ratings: dict) -> list:
-        """Takes a dict of movies names and ratings,
-        returns all movies with the highest rating.
-        """
-        return [key for key, val in movies_ratings.items()
-                if val == max(movies_ratings.values())]
-
-    @staticmethod
-    def get_worst_movies(movies_ratings: dict) -> list:
-        """Takes a dict of movies names and ratings,
-        returns all movies with the lowest rating.
-        """
-        return [key for key, val in movies_ratings.items()
-                if val == min(movies_ratings.values())]
+    def median_rating(ratings) -> float:
+        """Takes a list or array of ratings and returns the median rating.
+        Uses a linear time partition instead of sorting, an array('d') is
+        partitioned in place."""
+        import numpy as np
+        values = np.asarray(ratings, dtype=float)
+        mid = len(values) // 2
+        if len(values) % 2 == 0:
+            values.partition([mid - 1, mid])
+            return float(values[mid - 1] + values[mid]) / 2
+        values.partition(mid)
+        return float(values[mid])
 
     @staticmethod
     def print_movies_list(movies_list: list, best: bool = True) -> str:
@@ -0,0 +1,53 @@
+import json
+import sys
+
+OUTPUT_FORMATS = ('text', 'jsonl', 'tsv')
+TSV_FIELDS = ('title', 'rating', 'year', 'genre', 'director', 'country',
+              'alpha_2', 'imdbID', 'img', 'note')
+
+
+class MovieWriter:
+    """Movie rows writer, formats (key, movie dict) rows and writes them to
+    a stream in batches, one write call per batch instead of one per row.
+
+    Formats: 'text' is the app's 'Title: 8.8/10 (1994)' listing, 'jsonl'
+    writes a json object per movie with its key, and 'tsv' writes a header
+    and the TSV_FIELDS columns.
+    """
+    def __init__(self, stream=None, output_format='text', batch_size=1000):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}'")
+        self.stream = sys.stdout if stream is None else stream
+        self.output_format = output_format
+        self.batch_size = batch_size
+
+    @staticmethod
+    def format_text(key, movie) -> str:
+        return f'{movie["title"]}: {movie["rating"]:.1f}/10 ({movie["year"]})\n'
+
+    @staticmethod
+    def format_jsonl(key, movie) -> str:
+        return json.dumps({'key': key, **movie}) + '\n'
+
+    @staticmethod
+    def format_tsv(key, movie) -> str:
+        values = (str(movie.get(field, '')) for field in TSV_FIELDS)
+        return '\t'.join(value.replace('\t', ' ').replace('\n', ' ')
+                         for value in values) + '\n'
+
+    def write_rows(self, rows) -> int:
+        """Writes all (key, movie dict) rows, returns how many were written"""
+        format_row = getattr(self, f'format_{self.output_format}')
+        if self.output_format == 'tsv':
+            self.stream.write('\t'.join(TSV_FIELDS) + '\n')
+
+        count = 0
+        batch = []
+        for key, movie in rows:
+            batch.append(format_row(key, movie))
+            if len(batch) >= self.batch_size:
+                self.stream.write(''.join(batch))
+                count += len(batch)
+                batch.clear()
+        self.stream.write(''.join(batch))
+        return count + len(batch)
@@ -0,0 +1,183 @@
+import functools
+import inspect
+import threading
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+
+
+class Profiler:
+    """Opt-in instrumentation of the app's hot paths.
+
+    install() wraps the menu actions, the storage methods and the external
+    calls (OMDb requests, fuzzy matching, rendering) with timing spans, and
+    uninstall() puts the originals back, so nothing is wrapped when
+    profiling is off. Spans nest, the time of each stack of spans is kept
+    for the per-action report and for folded stacks that flame graph tools
+    read. Each thread has its own stack, so spans of worker threads, like
+    the bulk import requests, start at the top level. The bytes the storage
+    read and wrote and the API cache hits and misses are counted per action.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._patched = []
+        self.spans = defaultdict(lambda: [0, 0.0, 0.0])
+        self.counters = defaultdict(Counter)
+
+    @staticmethod
+    def sample_counters(movie_app) -> Counter:
+        """Returns the current storage and API cache counters of the app"""
+        counters = Counter(bytes_read=movie_app.storage.bytes_read,
+                           bytes_written=movie_app.storage.bytes_written)
+        if movie_app._api_cache is not None:
+            counters['cache_hits'] = movie_app._api_cache.hits
+            counters['cache_misses'] = movie_app._api_cache.misses
+        return counters
+
+    def wrap_action(self, action, movie_app):
+        """Returns the menu action timed as a span, adding the counters it
+        changed to the counters of the action"""
+        timed_action = self.wrap(action, action.__name__)
+
+        @functools.wraps(action)
+        def wrapper(*args, **kwargs):
+            before = self.sample_counters(movie_app)
+            try:
+                return timed_action(*args, **kwargs)
+            finally:
+                counters = self.sample_counters(movie_app)
+                counters.subtract(before)
+                self.counters[action.__name__].update(+counters)
+        return wrapper
+
+    def get_stack(self) -> tuple:
+        """Returns the span names and child times stacks of this thread"""
+        local = self._local
+        if not hasattr(local, 'stack'):
+            local.stack = []
+            local.child_times = []
+        return local.stack, local.child_times
+
+    def start_span(self, name: str) -> None:
+        stack, child_times = self.get_stack()
+        stack.append(name)
+        child_times.append(0.0)
+
+    def end_span(self, elapsed: float) -> None:
+        """Records the span on top of the stack, its total time and its
+        self time, without the time of the spans under it"""
+        stack, child_times = self.get_stack()
+        self_time = elapsed - child_times.pop()
+        with self._lock:
+            stats = self.spans[tuple(stack)]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] += self_time
+        stack.pop()
+        if child_times:
+            child_times[-1] += elapsed
+
+    def wrap(self, func, name: str):
+        """Returns func timed as a span, iterators it returns are timed
+        while they are consumed"""
+        profiler = self
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler.start_span(name)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                profiler.end_span(time.perf_counter() - start)
+            if isinstance(result, Iterator):
+                return profiler.wrap_iterator(result, name)
+            return result
+        return wrapper
+
+    def wrap_iterator(self, iterator, name: str):
+        """Yields the items of the iterator, timing each step as a span"""
+        while True:
+            self.start_span(name)
+            start = time.perf_counter()
+            try:
+                item = next(iterator, StopIteration)
+            finally:
+                self.end_span(time.perf_counter() - start)
+            if item is StopIteration:
+                return
+            yield item
+
+    def patch(self, target, attribute: str, name: str) -> None:
+        """Replaces target.attribute with a timed wrapper, keeping
+        staticmethods and classmethods as they are"""
+        original = inspect.getattr_static(target, attribute)
+        if isinstance(original, (staticmethod, classmethod)):
+            wrapped = type(original)(self.wrap(original.__func__, name))
+        else:
+            wrapped = self.wrap(getattr(target, attribute), name)
+        self._patched.append((target, attribute, original,
+                              attribute in vars(target)))
+        setattr(target, attribute, wrapped)
+
+    def install(self, movie_app) -> None:
+        """Instruments the app, its storage and the external calls"""
+        self._patched.append((movie_app, 'func_dict', movie_app.func_dict,
+                              True))
+        movie_app.func_dict = {number: self.wrap_action(action, movie_app)
+                               for number, action
+                               in movie_app.func_dict.items()}
+        # Actions that main.py runs without the menu
+        for method in ('export_movies', 'bulk_import', 'generate_histogram',
+                       'generate_website'):
+            self._patched.append((movie_app, method, None, False))
+            setattr(movie_app, method,
+                    self.wrap_action(getattr(movie_app, method), movie_app))
+        storage = movie_app.storage
+        for method in ('list_movies', 'iter_movies', 'add_movie',
+                       'delete_movie', 'update_movie', 'flush', 'top_movies',
+                       'search_movies', 'rating_histogram',
+                       'rating_aggregates'):
+            if hasattr(storage, method):
+                self.patch(storage, method, f'storage.{method}')
+        from .histogram import HistogramGenerator
+        from .web_gen import WebGenerator
+        self.patch(HistogramGenerator, 'render', 'render.histogram')
+        self.patch(WebGenerator, 'serialize_all_data', 'render.website')
+        self.patch(WebGenerator, 'stream_web_pages', 'render.website')
+        try:
+            from .api_request import MovieAPIRequest
+            from thefuzz import process
+        except ImportError:
+            return
+        self.patch(MovieAPIRequest, 'get_request_from_api', 'external.omdb')
+        self.patch(process, 'extract', 'external.fuzzy')
+
+    def uninstall(self) -> None:
+        """Restores everything install() replaced"""
+        for target, attribute, original, own in reversed(self._patched):
+            if own:
+                setattr(target, attribute, original)
+            else:
+                delattr(target, attribute)
+        self._patched.clear()
+
+    def format_report(self) -> str:
+        """Returns the time of every action and of the spans under it"""
+        lines = [f'{"span":<44} {"calls":>7} {"total":>10} {"self":>10}']
+        for path, (calls, total, self_time) in sorted(self.spans.items()):
+            name = '  ' * (len(path) - 1) + path[-1]
+            lines.append(f'{name:<44} {calls:>7} {total * 1000:>8.1f}ms '
+                         f'{self_time * 1000:>8.1f}ms')
+            if len(path) == 1:
+                for counter, amount in sorted(self.counters[path[0]].items()):
+                    lines.append(f'  [{counter}] {amount}')
+        return '\n'.join(lines)
+
+    def write_folded(self, file_path: str) -> None:
+        """Writes the self time of every stack in microseconds, in the
+        folded format of flamegraph.pl and speedscope"""
+        with open(file_path, 'w') as file:
+            for path, (_, _, self_time) in sorted(self.spans.items()):
+                file.write(f"{';'.join(path)} {round(self_time * 1e6)}\n")
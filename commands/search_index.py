@@ -0,0 +1,81 @@
+from collections import defaultdict
+
+
+class SearchIndex:
+    """Trigram index over the movie keys, used to search movie names.
+
+    Substring searches only check the keys that contain every trigram of
+    the query. Fuzzy searches score all keys, since a key can score high
+    without sharing trigrams with the query. Results keep the order in
+    which the keys were added, like the movies dict does. The index also keeps
+    the title, rating and year of every movie, so search results can be
+    shown without reading the storage again.
+    """
+    def __init__(self, movies=()):
+        self._trigrams = defaultdict(set)
+        self._order = {}
+        self._summaries = {}
+        self._next_position = 0
+        for key, movie in movies:
+            self.add(key, movie)
+
+    def __len__(self):
+        return len(self._order)
+
+    @staticmethod
+    def get_trigrams(text: str) -> set:
+        """Returns the set of 3 character substrings of the text"""
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def get(self, key: str) -> dict:
+        """Returns the title, rating and year of an indexed movie"""
+        return self._summaries[key]
+
+    def add(self, key: str, movie: dict) -> None:
+        """Adds a movie to the index, or updates its summary"""
+        self._summaries[key] = {field: movie.get(field)
+                                for field in ('title', 'rating', 'year')}
+        if key in self._order:
+            return
+        self._order[key] = self._next_position
+        self._next_position += 1
+        for trigram in self.get_trigrams(key):
+            self._trigrams[trigram].add(key)
+
+    def remove(self, key: str) -> None:
+        """Removes a movie key from the index"""
+        if self._order.pop(key, None) is None:
+            return
+        del self._summaries[key]
+        for trigram in self.get_trigrams(key):
+            keys = self._trigrams[trigram]
+            keys.discard(key)
+            if not keys:
+                del self._trigrams[trigram]
+
+    def search(self, query: str) -> list:
+        """Returns the keys that contain the query, in the order they were
+        added. Queries shorter than 3 characters check all keys."""
+        query = query.lower()
+        trigrams = self.get_trigrams(query)
+        if not trigrams:
+            candidates = self._order
+        else:
+            postings = sorted((self._trigrams.get(trigram, set())
+                               for trigram in trigrams), key=len)
+            candidates = postings[0].intersection(*postings[1:])
+        matches = [key for key in candidates if query in key]
+        return sorted(matches, key=self._order.__getitem__)
+
+    def fuzzy_search(self, query: str, accuracy=75, limit=5) -> list:
+        """Returns the keys of up to limit best fuzzy matches of the query
+        scoring above accuracy, the same as thefuzz process.extract over
+        all keys. The threshold is passed to the scorer, so it can skip
+        the keys that can't reach it."""
+        from thefuzz import process
+        # Scores are rounded after scoring, so a rounded score above the
+        # accuracy needs a score of at least accuracy + 0.5
+        matches = process.extractBests(query, list(self._order),
+                                       score_cutoff=accuracy + 0.5,
+                                       limit=limit)
+        return [key for key, ratio in matches if ratio > accuracy]
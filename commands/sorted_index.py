@@ -0,0 +1,71 @@
+import heapq
+
+SORT_FIELDS = ('rating', 'year', 'title')
+
+
+class Descending:
+    """Wraps a value so it sorts in reverse order, for values like titles
+    that can't be negated"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class SortedIndex:
+    """Sorted orders of the movie keys, kept until clear() is called when
+    the movies change.
+
+    Movies can be sorted by any combination of SORT_FIELDS. Equal movies
+    keep their storage order. A page with a limit is taken with a heap
+    instead of sorting everything, unless the full order is already cached.
+    """
+    def __init__(self):
+        self._orders = {}
+
+    def clear(self) -> None:
+        """Drops the cached orders, after the movies changed"""
+        self._orders.clear()
+
+    @staticmethod
+    def make_sort_key(sort_fields: tuple, is_descending: bool):
+        """Returns a key function for (position, key, movie) items"""
+        def sort_key(item):
+            position, _, movie = item
+            values = []
+            for field in sort_fields:
+                value = movie[field]
+                if field == 'title':
+                    value = value.lower()
+                    if is_descending:
+                        value = Descending(value)
+                elif is_descending:
+                    value = -value
+                values.append(value)
+            values.append(position)
+            return values
+        return sort_key
+
+    def get_page(self, movies: dict, sort_fields=('rating',),
+                 is_descending=True, offset=0, limit=None) -> list:
+        """Returns the keys of the movies sorted by the fields, from offset
+        and at most limit of them"""
+        order = self._orders.get((sort_fields, is_descending))
+        if order is None:
+            items = ((position, key, movie) for position, (key, movie)
+                     in enumerate(movies.items()))
+            sort_key = self.make_sort_key(sort_fields, is_descending)
+            if limit is not None:
+                top = heapq.nsmallest(offset + limit, items, key=sort_key)
+                return [key for _, key, _ in top[offset:]]
+            order = [key for _, key, _ in sorted(items, key=sort_key)]
+            self._orders[(sort_fields, is_descending)] = order
+
+        end = None if limit is None else offset + limit
+        return order[offset:end]
@@ -0,0 +1,147 @@
+import json
+import os
+import zlib
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+BREAKDOWN_FIELDS = ('genre', 'director', 'decade')
+
+
+class StatsIndex:
+    """Ratings statistics that are kept up to date on every add, delete and
+    update instead of being recomputed from the whole catalogue.
+
+    Keeps the running sum and count, a sorted list of the ratings for the
+    lowest, highest and median rating, the titles of each rating for the
+    best and worst ties, and the count and sum per genre, director and
+    decade. It can be saved next to the data file together with a checksum
+    of the data files, and is only loaded back if the checksum matches.
+    """
+    def __init__(self, movies=None):
+        self.count = 0
+        self.total = 0.0
+        self._ratings = []
+        self._titles = defaultdict(dict)
+        self._groups = {field: defaultdict(lambda: [0, 0.0])
+                        for field in BREAKDOWN_FIELDS}
+        self._entries = {}
+        if movies is not None:
+            for key, movie in movies:
+                self.add(key, movie)
+
+    @staticmethod
+    def make_entry(movie: dict) -> tuple:
+        """Returns the movie fields the statistics use"""
+        return (movie['rating'], movie['title'], movie.get('genre'),
+                movie.get('director'), movie.get('year'))
+
+    def get_groups(self, entry: tuple):
+        """Yields the (field, group) pairs the entry belongs to"""
+        _, _, genre, director, year = entry
+        for field, names in (('genre', genre), ('director', director)):
+            if names:
+                for name in names.split(','):
+                    yield field, name.strip()
+        if isinstance(year, int):
+            yield 'decade', f'{year // 10 * 10}s'
+
+    def add(self, key: str, movie: dict) -> None:
+        """Adds a movie to the statistics, replacing one with the same key"""
+        entry = self.make_entry(movie)
+        if self._entries.get(key) == entry:
+            return
+        self.remove(key)
+        self._entries[key] = entry
+        rating = entry[0]
+        self.count += 1
+        self.total += rating
+        insort(self._ratings, rating)
+        self._titles[rating][key] = entry[1]
+        for field, group in self.get_groups(entry):
+            self._groups[field][group][0] += 1
+            self._groups[field][group][1] += rating
+
+    def remove(self, key: str) -> None:
+        """Removes a movie from the statistics, if it's there"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        rating = entry[0]
+        self.count -= 1
+        self.total -= rating
+        del self._ratings[bisect_left(self._ratings, rating)]
+        del self._titles[rating][key]
+        if not self._titles[rating]:
+            del self._titles[rating]
+        for field, group in self.get_groups(entry):
+            stats = self._groups[field][group]
+            stats[0] -= 1
+            stats[1] -= rating
+            if not stats[0]:
+                del self._groups[field][group]
+
+    update = add
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count
+
+    @property
+    def median(self) -> float:
+        mid = self.count // 2
+        if self.count % 2 == 0:
+            return (self._ratings[mid - 1] + self._ratings[mid]) / 2
+        return self._ratings[mid]
+
+    @property
+    def best_movies(self) -> list:
+        return list(dict.fromkeys(self._titles[self._ratings[-1]].values()))
+
+    @property
+    def worst_movies(self) -> list:
+        return list(dict.fromkeys(self._titles[self._ratings[0]].values()))
+
+    def breakdown(self, field: str) -> dict:
+        """Returns the amount of movies and average rating of every genre,
+        director or decade"""
+        return {group: {'count': count, 'average': total / count}
+                for group, (count, total) in self._groups[field].items()}
+
+    @staticmethod
+    def get_checksum(data_files: list) -> int:
+        """Returns a crc32 checksum of the contents of the data files"""
+        checksum = 0
+        for path in data_files:
+            if not os.path.isfile(path):
+                continue
+            with open(path, 'rb') as file:
+                while chunk := file.read(1 << 20):
+                    checksum = zlib.crc32(chunk, checksum)
+        return checksum
+
+    def save(self, index_path: str, data_files: list) -> None:
+        """Saves the statistics with the checksum of the data files"""
+        data = {'checksum': self.get_checksum(data_files),
+                'movies': [[key, *entry]
+                           for key, entry in self._entries.items()]}
+        with open(index_path, 'w') as file:
+            file.write(json.dumps(data))
+
+    @classmethod
+    def load(cls, index_path: str, data_files: list):
+        """Loads saved statistics, returns None if there are none or if the
+        data files changed since they were saved"""
+        try:
+            with open(index_path, 'r') as file:
+                data = json.loads(file.read())
+        except (OSError, ValueError):
+            return None
+        if data.get('checksum') != cls.get_checksum(data_files):
+            return None
+
+        stats_index = cls()
+        for key, rating, title, genre, director, year in data['movies']:
+            stats_index.add(key, {'rating': rating, 'title': title,
+                                  'genre': genre, 'director': director,
+                                  'year': year})
+        return stats_index
@@ -1,50 +1,211 @@
+import filecmp
+import glob
+import json
 import os
+import re
+from collections.abc import Mapping
 from pathlib import Path
 
+GRID_PLACEHOLDER = '        __TEMPLATE_MOVIE_GRID__'
+TITLE_PLACEHOLDER = '__TEMPLATE_TITLE__'
+PAGE_TITLE = 'David\'s Movies List'
+SEARCH_INDEX_NAME = 'search_index.js'
+SEARCH_INDEX_VARIABLE = 'movieSearchIndex'
+# The search index is loaded with a script tag instead of fetch(), which
+# browsers block for pages opened from file:// urls
+PAGINATION_HTML = '''<nav class="pagination">
+    {previous_link}<span>Page {page}</span>{next_link}
+    <input id="movie-search" type="search" placeholder="Find a movie">
+</nav>
+<script>
+document.getElementById('movie-search').addEventListener('change', event => {{
+    const query = event.target.value.toLowerCase();
+    const search = () => {{
+        const movie = window.{variable}.find(
+            ([title]) => String(title).toLowerCase().includes(query));
+        if (movie) window.location.href = movie[2];
+    }};
+    if (window.{variable}) return search();
+    const script = document.createElement('script');
+    script.src = '{search_index}';
+    script.onload = search;
+    document.head.appendChild(script);
+}});
+</script>
+'''
+
 
 class WebGenerator:
-    """Website generator class - allows to create movies website"""
+    """Website generator class - allows to create movies website.
+
+    The movies are a dict of movie dicts or an iterable of (key, movie)
+    pairs, such as storage.iter_movies().
+
+    stream_web_pages writes the page straight to disk, movie by movie,
+    optionally split into pages of per_page movies with a search index, so
+    large catalogues are built with bounded memory. Pages whose content
+    didn't change aren't replaced. generate_web_page builds the whole page
+    in memory instead.
+    """
     main_project_dir = Path(__file__).parent.parent
     template_path = os.path.join(main_project_dir,
                                  "_static", "index_template.html")
     new_index_path = os.path.join(main_project_dir,
                                   "_static", "index.html")
 
-    def __init__(self, movies_data, new_path=new_index_path):
+    def __init__(self, movies_data, new_path=None):
         self.movies = movies_data
-        self.new_path = new_path
+        self.new_path = new_path or WebGenerator.new_index_path
+        self.written_count = 0
+
+    def iter_movies(self):
+        """Returns an iterator of the (key, movie) pairs of the movies"""
+        if isinstance(self.movies, Mapping):
+            return iter(self.movies.items())
+        return iter(self.movies)
 
-    def generate_web_page(self) -> None:
+    def generate_web_page(self) -> bool:
         """Generate a html file from the index template, serialize data from
-        json file and embed serialized data in the new html file
+        json file and embed serialized data in the new html file.
+        Returns False if the file was already up to date.
         """
         template = self.get_html_template(WebGenerator.template_path)
         serialized_data = self.serialize_all_data()
-        self.create_html_file(self.new_path, template, serialized_data)
-
-    def create_html_file(self, new_path, template, serialized_data):
-        """Create or recreate the html file in the new path, based on provided template
-        and replace placeholders with serialized data"""
-        with open(new_path, 'w') as file:
-            new_html = self.replace_template_placeholders(template,
-                                                          serialized_data)
+        return self.create_html_file(self.new_path, template, serialized_data)
+
+    def create_html_file(self, new_path, template, serialized_data) -> bool:
+        """Create or recreate the html file in the new path, based on provided
+        template and replace placeholders with serialized data. The file
+        isn't written if it already has the same content."""
+        new_html = self.replace_template_placeholders(template,
+                                                      serialized_data)
+        try:
+            with open(new_path, 'r', encoding='utf-8') as file:
+                if file.read() == new_html:
+                    return False
+        except OSError:
+            pass
+        with open(new_path, 'w', encoding='utf-8') as file:
             file.write(new_html)
+        return True
 
     @staticmethod
     def replace_template_placeholders(template, serialized_data):
-        """Replaces the placeholders in the template"""
-        new_html = template.replace('        __TEMPLATE_MOVIE_GRID__',
-                                    serialized_data)
-        return new_html.replace('__TEMPLATE_TITLE__', 'David\'s Movies List')
+        """Replaces the placeholders in the template in a single pass"""
+        values = {GRID_PLACEHOLDER: serialized_data,
+                  TITLE_PLACEHOLDER: PAGE_TITLE}
+        return re.sub(f'{re.escape(GRID_PLACEHOLDER)}|{TITLE_PLACEHOLDER}',
+                      lambda match: values[match.group()], template)
+
+    @staticmethod
+    def split_template(template) -> tuple:
+        """Returns the template parts before and after the movie grid, with
+        the title placeholder replaced"""
+        head, tail = template.split(GRID_PLACEHOLDER)
+        return (head.replace(TITLE_PLACEHOLDER, PAGE_TITLE),
+                tail.replace(TITLE_PLACEHOLDER, PAGE_TITLE))
+
+    @staticmethod
+    def get_page_name(page: int) -> str:
+        return 'index.html' if page == 1 else f'page_{page}.html'
+
+    def serialize_pagination(self, page: int, has_next: bool) -> str:
+        """Returns the navigation of a page, the same size on every page"""
+        previous_link = next_link = ''
+        if page > 1:
+            previous_link = (f'<a href="{self.get_page_name(page - 1)}">'
+                             f'&laquo; Previous</a>')
+        if has_next:
+            next_link = (f'<a href="{self.get_page_name(page + 1)}">'
+                         f'Next &raquo;</a>')
+        return PAGINATION_HTML.format(previous_link=previous_link, page=page,
+                                      next_link=next_link,
+                                      search_index=SEARCH_INDEX_NAME,
+                                      variable=SEARCH_INDEX_VARIABLE)
+
+    def replace_if_changed(self, tmp_path, path) -> None:
+        """Moves the new file at tmp_path to path unless path already has
+        the same content, counting the replaced files in written_count"""
+        if os.path.isfile(path) and filecmp.cmp(tmp_path, path,
+                                                shallow=False):
+            os.remove(tmp_path)
+            return
+        os.replace(tmp_path, path)
+        self.written_count += 1
+
+    def stream_web_pages(self, output_dir=None, per_page=None) -> int:
+        """Writes the website to output_dir one movie at a time, without
+        building the page in memory. With per_page the movies are split
+        into index.html, page_2.html, ... and a search index script of
+        [title, year, page] items is written next to them. Every file is
+        written next to its old version and replaces it only if it
+        changed. Returns the number of pages.
+        """
+        output_dir = output_dir or os.path.dirname(self.new_path)
+        items = self.iter_movies()
+        head, tail = self.split_template(
+            self.get_html_template(WebGenerator.template_path))
+        self.written_count = 0
+        search_index = None
+        search_index_path = os.path.join(output_dir, SEARCH_INDEX_NAME)
+        if per_page:
+            search_index = open(search_index_path + '.tmp', 'w',
+                                encoding='utf-8')
+            search_index.write(f'window.{SEARCH_INDEX_VARIABLE} = [')
+        separator = '\n'
+        next_item = next(items, None)
+        page = 0
+        try:
+            while page == 0 or next_item is not None:
+                page += 1
+                page_path = os.path.join(output_dir, self.get_page_name(page))
+                with open(page_path + '.tmp', 'w',
+                          encoding='utf-8') as file:
+                    file.write(head)
+                    count = 0
+                    while next_item is not None and \
+                            (not per_page or count < per_page):
+                        movie_info = next_item[1]
+                        file.write(self.serialize_single_data_item(movie_info))
+                        if search_index is not None:
+                            search_index.write(separator + json.dumps(
+                                [movie_info.get('title'),
+                                 movie_info.get('year'),
+                                 self.get_page_name(page)]))
+                            separator = ',\n'
+                        count += 1
+                        next_item = next(items, None)
+                    if per_page:
+                        navigation = self.serialize_pagination(
+                            page, has_next=next_item is not None)
+                        file.write(tail.replace('</body>',
+                                                navigation + '</body>'))
+                    else:
+                        file.write(tail)
+                self.replace_if_changed(page_path + '.tmp', page_path)
+        finally:
+            if search_index is not None:
+                search_index.write('\n];\n')
+                search_index.close()
+        if search_index is not None:
+            self.replace_if_changed(search_index_path + '.tmp',
+                                    search_index_path)
+        self.remove_stale_pages(output_dir, page)
+        return page
+
+    def remove_stale_pages(self, output_dir, pages: int) -> None:
+        """Deletes the page files left from a build with more pages"""
+        for path in glob.glob(os.path.join(output_dir, 'page_*.html')):
+            number = os.path.basename(path)[len('page_'):-len('.html')]
+            if number.isdigit() and int(number) > pages:
+                os.remove(path)
 
     def serialize_all_data(self) -> str:
-        """Reads data from json file and generates a html serialized version
-        from data. Returns a html string with all items from the json data file.
+        """Generates the html of every movie. Returns a html string with all
+        items from the movies data.
         """
-        serialized_data = ''
-        for movie_info in self.movies.values():
-            serialized_data += self.serialize_single_data_item(movie_info)
-        return serialized_data
+        return ''.join(self.serialize_single_data_item(movie_info)
+                       for _, movie_info in self.iter_movies())
 
     @staticmethod
     def serialize_single_data_item(movie_dict: dict) -> str:
@@ -54,13 +215,13 @@ class WebGenerator:
         output_html = f'''\t\t<li><div class="movie tooltip">
     \t\t\t<a href="https://www.imdb.com/title/{movie_dict["imdbID"]}/" target="_blank">
     \t\t\t<div class="ribbon-wrapper"><div class="ribbon">{movie_dict["rating"]}/10</div></div>
-    \t\t\t<img class="movie-poster" src="{movie_dict["img"]}"></a>
+    \t\t\t<img class="movie-poster" loading="lazy" src="{movie_dict["img"]}"></a>
     \t\t\t<div class="movie-info">
     \t\t\t\t<div class="movie-text">
     \t\t\t\t\t<div class="movie-title">{movie_dict["title"]}</div>
     \t\t\t\t\t<div class="movie-year">{movie_dict["year"]}</div>
     \t\t\t\t</div>
-    \t\t\t\t<img class="country"src="https://flagsapi.com/{movie_dict["alpha_2"]}/flat/64.png"></div>
+    \t\t\t\t<img class="country" loading="lazy" src="https://flagsapi.com/{movie_dict["alpha_2"]}/flat/64.png"></div>
     '''
         if movie_dict.get('note'):
             output_html += f'\t\t\t\t<span class="tooltiptext">{movie_dict["note"]}</span>'
@@ -1,40 +1,181 @@
-import sys
+import argparse
 import os
+import sys
 from pathlib import Path
-from storage.storage_csv import StorageCsv
 from storage.storage_json import StorageJson
+from storage.storage_journal import StorageJournal
+from storage.storage_sqlite import StorageSqlite
+from storage.storage_binary import StorageBinary
+from commands.command_runner import CommandRunner
+from commands.histogram import CHARTS
+from commands.movie_writer import OUTPUT_FORMATS
+from commands.profiler import Profiler
 from movie_app import MovieApp
 
 
 ROOT_PATH = Path(__file__).parent
 
 
-def get_storage_arg():
-    """Get storage args from terminal call"""
+def parse_args():
+    """Parse the terminal call arguments"""
+    parser = argparse.ArgumentParser(description="My Movies Database")
+    parser.add_argument("storage", nargs="?",
+                        help="storage file name, its extension selects "
+                             "the storage type")
+    parser.add_argument("--import", dest="import_file", metavar="FILE",
+                        help="import the movie titles listed in FILE "
+                             "('-' for stdin) and exit")
+    parser.add_argument("--list", action="store_true",
+                        help="print all movies without the menu and exit")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="text",
+                        help="output format of --list (default: text)")
+    parser.add_argument("--command", dest="commands", action="append",
+                        metavar="CMD",
+                        help="run a command like 'update TITLE NOTE' "
+                             "without the menu, can be repeated, and exit")
+    parser.add_argument("--script", metavar="FILE",
+                        help="run the commands listed in FILE, one per line "
+                             "('-' for stdin), in one batch and exit")
+    parser.add_argument("--compact", action="store_true",
+                        help="keep json movies in a compact columnar table, "
+                             "for large catalogues")
+    parser.add_argument("--charts", nargs="+", choices=CHARTS,
+                        help="save the histograms of these charts and exit")
+    parser.add_argument("--website", action="store_true",
+                        help="generate the website and exit")
+    parser.add_argument("--per-page", type=int, metavar="N",
+                        help="split the --website movies into pages of N")
+    parser.add_argument("--convert", metavar="TARGET",
+                        help="copy all movies into the TARGET storage file, "
+                             "its extension selects the format, and exit")
+    parser.add_argument("--profile", action="store_true",
+                        help="time the actions, storage and external calls "
+                             "and print a breakdown to stderr at the end")
+    parser.add_argument("--profile-output", metavar="FILE",
+                        help="with --profile, also save a cProfile dump if "
+                             "FILE ends with .prof, otherwise folded stacks "
+                             "for flame graphs")
+    return parser.parse_args()
+
+
+def get_storage_arg(storage=None):
+    """Get storage path from the storage file name given in terminal call"""
     default_path = os.path.join(ROOT_PATH, "storage", "json_files",
                                 "movies.json")
-    if len(sys.argv) <= 1:
+    if storage is None:
         return default_path
-    storage = sys.argv[1]
     if storage.endswith(".csv"):
         full_path = os.path.join(ROOT_PATH, "storage", "csv_files", storage)
     elif storage.endswith(".json"):
         full_path = os.path.join(ROOT_PATH, "storage", "json_files", storage)
+    elif storage.endswith(".jnl"):
+        full_path = os.path.join(ROOT_PATH, "storage", "journal_files",
+                                 storage)
+    elif storage.endswith(".sqlite"):
+        full_path = os.path.join(ROOT_PATH, "storage", "sqlite_files",
+                                 storage)
+    elif storage.endswith(".bin"):
+        full_path = os.path.join(ROOT_PATH, "storage", "binary_files",
+                                 storage)
     else:
         print("Wrong file input, sets default storage.")
         full_path = default_path
     return full_path
 
 
+def create_storage(storage_path, compact=False, cache=True):
+    """Returns the storage object matching the storage file extension"""
+    if storage_path.endswith(".csv"):
+        # pandas is only loaded for the csv storage
+        from storage.storage_csv import StorageCsv
+        return StorageCsv(storage_path)
+    if storage_path.endswith(".jnl"):
+        return StorageJournal(storage_path)
+    if storage_path.endswith(".sqlite"):
+        return StorageSqlite(storage_path)
+    if storage_path.endswith(".bin"):
+        return StorageBinary(storage_path)
+    return StorageJson(storage_path, cache=cache, compact=compact)
+
+
+def convert_storage(storage, target_path):
+    """Copies all the movies of the storage into the target storage"""
+    if os.path.exists(target_path):
+        print(f"'{target_path}' already exists, choose a new file.")
+        return
+    target = create_storage(target_path)
+    movies = {title: dict(movie) for title, movie in storage.iter_movies()}
+    if movies:
+        target.add_movie(movies)
+    target.flush()
+    print(f"Copied {len(movies)} movies to '{target_path}'")
+
+
+def run_mode(args, movie_app):
+    """Runs the action selected by the arguments, or the menu"""
+    if not (args.import_file or args.charts or args.website or args.list or
+            args.commands or args.script):
+        movie_app.run()
+        return
+    # Without the menu exit_program doesn't run, so the app is closed here
+    try:
+        if args.import_file:
+            movie_app.bulk_import(args.import_file)
+        elif args.charts:
+            movie_app.generate_histogram(charts=args.charts)
+        elif args.website:
+            movie_app.generate_website(per_page=args.per_page)
+        elif args.list:
+            movie_app.export_movies(args.format)
+        else:
+            run_commands(args, movie_app)
+    finally:
+        movie_app.close()
+
+
+def run_commands(args, movie_app):
+    """Runs the --command commands and the --script commands in one batch,
+    writing a json result line per command"""
+    lines = list(args.commands or ())
+    if args.script == '-':
+        lines.extend(sys.stdin)
+    elif args.script:
+        with open(args.script, encoding='utf-8') as file_obj:
+            lines.extend(file_obj)
+    _, failed = CommandRunner(movie_app).run(lines)
+    if failed:
+        sys.exit(1)
+
+
 def main():
     """Main function initialization"""
-    storage_path = get_storage_arg()
-    if storage_path.endswith(".csv"):
-        storage = StorageCsv(storage_path)
-    else:
-        storage = StorageJson(storage_path)
+    args = parse_args()
+    storage = create_storage(get_storage_arg(args.storage), args.compact)
+    if args.convert:
+        convert_storage(storage, get_storage_arg(args.convert))
+        return
     movie_app = MovieApp(storage)
-    movie_app.run()
+    if not args.profile:
+        run_mode(args, movie_app)
+        return
+
+    profiler = Profiler()
+    profiler.install(movie_app)
+    c_profile = None
+    if args.profile_output and args.profile_output.endswith(".prof"):
+        import cProfile
+        c_profile = cProfile.Profile()
+        c_profile.enable()
+    try:
+        run_mode(args, movie_app)
+    finally:
+        if c_profile is not None:
+            c_profile.disable()
+            c_profile.dump_stats(args.profile_output)
+        elif args.profile_output:
+            profiler.write_folded(args.profile_output)
+        profiler.uninstall()
+        print(profiler.format_report(), file=sys.stderr)
 
 
 if __name__ == '__main__':
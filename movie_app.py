@@ -1,8 +1,13 @@
+import os
 import random
-from thefuzz import process
-import matplotlib.pyplot as plt
-from commands.api_request import MovieAPIRequest
+import sys
+from commands.api_cache import ApiResponseCache
+from commands.histogram import RATING_BINS, HistogramGenerator
 from commands.movie_stats import MovieStats
+from commands.movie_writer import MovieWriter
+from commands.search_index import SearchIndex
+from commands.sorted_index import SortedIndex
+from commands.stats_index import StatsIndex
 from commands.web_gen import WebGenerator
 
 
@@ -10,6 +15,11 @@ class MovieApp:
     """Movie application main class"""
     def __init__(self, storage):
         self.storage = storage
+        self._api_cache = None
+        self._search_index = None
+        self._stats_index = None
+        self._data_stamp = None
+        self._sorted_index = SortedIndex()
         self.func_dict = {
             0: self.exit_program,
             1: self.list_movies,
@@ -21,7 +31,8 @@ class MovieApp:
             7: self.search_movie,
             8: self.sort_movies,
             9: self.generate_histogram,
-            10: self.generate_website
+            10: self.generate_website,
+            11: self.bulk_import
         }
 
     def run(self):
@@ -29,13 +40,20 @@ class MovieApp:
         print("********** My Movies Database **********")
 
         try:
-            action = self.choose_action()
-            while action:
+            while True:
+                action = self.choose_action()
                 self.func_dict[action]()
                 self.post_action_buffer()
-                action = self.choose_action()
         except self.BreakException:
             pass
+        except (KeyboardInterrupt, EOFError):
+            # Ctrl+C or the end of the input quits like choosing 0, so
+            # the pending changes are still saved
+            print()
+            try:
+                self.exit_program()
+            except self.BreakException:
+                pass
 
     def print_menu(self) -> None:
         """Prints menu each command name and number in a new line
@@ -55,10 +73,11 @@ class MovieApp:
         and return a valid int input number
         """
         self.print_menu()
-        action = input("Enter choice (0-10): ")
+        prompt = f"Enter choice (0-{max(self.func_dict)}): "
+        action = input(prompt)
         while self.validate_action(action):
             print("Invalid choice")
-            action = input("Enter choice (0-10): ")
+            action = input(prompt)
         print()
         return int(action)
 
@@ -72,9 +91,23 @@ class MovieApp:
 
     # ======================== Action 0. Quit program ==========================
     def exit_program(self) -> None:
-        """Raises an exception to break out of the main loop"""
+        """Writes pending storage changes and raises an exception
+        to break out of the main loop"""
+        self.close()
         raise self.BreakException
 
+    def close(self) -> None:
+        """Writes pending storage changes, saves the statistics index and
+        closes the API response cache"""
+        # Checked before the pending changes are written, so only outside
+        # changes drop the statistics index instead of saving it for them
+        self.check_storage_changes()
+        self.storage.flush()
+        self.save_stats_index()
+        if self._api_cache is not None:
+            self._api_cache.close()
+            self._api_cache = None
+
     class BreakException(BaseException):
         """Exception to break out of main loop"""
 
@@ -88,10 +121,20 @@ class MovieApp:
         else:
             movies = movie_data
 
-        for info in movies.values():
-            print(f'{info["title"]}: {info["rating"]:.1f}/10 ({info["year"]})')
+        MovieWriter(sys.stdout).write_rows(movies.items())
         print(f'{len(movies)} movies in total\n')
 
+    def export_movies(self, output_format='text', stream=None) -> None:
+        """Streams all movies from the storage to the stream, by default
+        stdout, in the 'text', 'jsonl' or 'tsv' format without loading
+        them all first.
+        """
+        writer = MovieWriter(stream, output_format)
+        count = writer.write_rows(self.storage.iter_movies())
+        if output_format == 'text':
+            writer.stream.write(f'{count} movies in total\n')
+        writer.stream.flush()
+
     # ========================== Action 2. Add movie ===========================
     def add_movie(self, title=None) -> None:
         """Adds a movie by fetching data from api, if title is not provided asks
@@ -103,16 +146,26 @@ class MovieApp:
         if movie_name in movies:
             print(f"Movie '{movies[movie_name]['title']}' already exists")
         else:
-            movie_api_request = MovieAPIRequest()
+            # Loads requests and pycountry only when a movie is added
+            from commands.api_request import MovieAPIRequest
+            movie_api_request = MovieAPIRequest(cache=self.api_cache)
             new_movie_dict = movie_api_request.get_movie_data(movie_name)
             if new_movie_dict.get('error'):
                 # If error in fetching data, output the error message.
                 print(new_movie_dict['error'])
             else:
                 self.storage.add_movie(new_movie_dict)
+                self.update_indexes(changed=new_movie_dict)
                 print(f"Movie '{new_movie_dict[movie_name]['title']}' "
                       f"successfully added")
 
+    @property
+    def api_cache(self) -> ApiResponseCache:
+        """Returns the API response cache, opening it on first use"""
+        if self._api_cache is None:
+            self._api_cache = ApiResponseCache()
+        return self._api_cache
+
     # ================ Assisting function for commands 2, 3, 4 ================
     @staticmethod
     def get_title(title, operation: str) -> str:
@@ -121,6 +174,39 @@ class MovieApp:
             return input(f"Enter movie name to {operation}: ").lower()
         return title.lower()
 
+    def update_indexes(self, changed=None, deleted=()) -> None:
+        """Updates the search and statistics indexes that were already built
+        with the added or updated movies dict and the deleted movie names"""
+        changed = changed or {}
+        self._sorted_index.clear()
+        if self._search_index is not None:
+            for movie_name, info in changed.items():
+                self._search_index.add(movie_name, info)
+            for movie_name in deleted:
+                self._search_index.remove(movie_name)
+        if self._stats_index is not None:
+            for movie_name, info in changed.items():
+                self._stats_index.update(movie_name, info)
+            for movie_name in deleted:
+                self._stats_index.remove(movie_name)
+        self._data_stamp = self.get_data_stamp()
+
+    def get_data_stamp(self) -> tuple:
+        """Returns the modification times and sizes of the storage files"""
+        return tuple((stat.st_mtime_ns, stat.st_size) for stat in
+                     map(os.stat, filter(os.path.isfile,
+                                         self.storage.data_files())))
+
+    def check_storage_changes(self) -> None:
+        """Drops the indexes if the storage files were changed by someone
+        else since the indexes were built or last updated"""
+        data_stamp = self.get_data_stamp()
+        if data_stamp != self._data_stamp:
+            self._search_index = None
+            self._stats_index = None
+            self._sorted_index.clear()
+            self._data_stamp = data_stamp
+
     # ========================= Action 3. Delete movie =========================
     def delete_movie(self, title=None) -> None:
         """Deletes a movie entry from json file. If title is not provided
@@ -130,8 +216,11 @@ class MovieApp:
         movie_name = self.get_title(title, operation='delete')
 
         if movie_name in movies:
+            # Cached storages return their own dict, read the title first
+            movie_title = movies[movie_name]['title']
             self.storage.delete_movie(movie_name)
-            print(f"Movie '{movies[movie_name]['title']}' successfully deleted")
+            self.update_indexes(deleted=[movie_name])
+            print(f"Movie '{movie_title}' successfully deleted")
         else:
             print(f"Movie '{movie_name}' doesn't exist!")
 
@@ -149,6 +238,7 @@ class MovieApp:
             else:
                 note_input = note
             self.storage.update_movie(movie_name, note_input)
+            self.update_indexes(changed={movie_name: movies[movie_name]})
             print(f"Movie '{movies[movie_name]['title']}' successfully updated")
         else:
             print(f"Movie '{movie_name}' doesn't exist!")
@@ -158,14 +248,59 @@ class MovieApp:
         """Prints statistics of current data from the json file,
         average movie rating, median movie rating,
         and movie/s with best and worst ratings"""
-        movies = self.storage.list_movies()
-        print(MovieStats(movies))
+        summary = self.get_stats_summary()
+        if summary is None:
+            print("No rated movies to analyze.")
+            return
+        print(MovieStats.from_summary(
+            summary['average'], summary['median'],
+            summary['best_movies'], summary['worst_movies']))
+
+    def get_stats_summary(self) -> dict:
+        """Returns the average, median, best and worst rated movies,
+        None if there are no rated movies"""
+        if hasattr(self.storage, 'rating_aggregates'):
+            return self.storage.rating_aggregates()
+        stats_index = self.get_stats_index()
+        if not stats_index.count:
+            return None
+        return {'average': stats_index.average,
+                'median': stats_index.median,
+                'best_movies': stats_index.best_movies,
+                'worst_movies': stats_index.worst_movies}
+
+    def get_stats_index(self) -> StatsIndex:
+        """Returns the statistics index, loading it from the file saved next
+        to the storage data or building it from the storage on first use"""
+        self.check_storage_changes()
+        if self._stats_index is None:
+            data_files = self.storage.data_files()
+            if data_files:
+                self._stats_index = StatsIndex.load(
+                    data_files[0] + '.stats', data_files)
+            if self._stats_index is None:
+                self._stats_index = StatsIndex(self.storage.iter_movies())
+        return self._stats_index
+
+    def save_stats_index(self) -> None:
+        """Saves the statistics index next to the storage data, if it was
+        used and not dropped by an outside change, so the next session
+        doesn't need to rebuild it"""
+        data_files = self.storage.data_files()
+        if self._stats_index is not None and data_files:
+            self._stats_index.save(data_files[0] + '.stats', data_files)
 
     # ========================= Action 6. Random movie =========================
     def random_movie(self) -> None:
         """Prints random movie from the json data"""
-        movies = self.storage.list_movies()
-        info = random.choice(list(movies.values()))
+        # Reservoir sampling picks a movie in one pass over the storage
+        info = None
+        for count, (_, movie) in enumerate(self.storage.iter_movies(), 1):
+            if random.randrange(count) == 0:
+                info = movie
+        if info is None:
+            print("There are no movies to choose from.")
+            return
         print(f"Your movie for tonight: {info['title']} ({info['year']}), "
               f"it's rated {info['rating']}/10")
 
@@ -176,56 +311,125 @@ class MovieApp:
         """
         search_accuracy = 75
 
-        movies = self.storage.list_movies()
         search_query = input("Enter part of the movie name: ")
-
-        search_results = [movie_name for movie_name in movies
-                          if search_query.lower() in movie_name]
+        search_results = self.find_movies(search_query)
 
         # If no results found during exact search, checks for fuzzy search
         if not search_results:
             print(f"The exact search '{search_query}' didn't yield results.")
-            search_results = [mov_name for mov_name, ratio in process.extract(
-                search_query, list(movies.keys())) if ratio > search_accuracy]
+            search_index = self.get_search_index()
+            search_results = {mov_name: search_index.get(mov_name)
+                              for mov_name in search_index.fuzzy_search(
+                                  search_query, search_accuracy)}
             if search_results:
                 print("Maybe you meant:")
 
         # If found matches in search, print them line by line
         if search_results:
-            for title in search_results:
-                print(f"{movies[title]['title']}: {movies[title]['rating']}/10 "
-                      f"({movies[title]['year']})")
+            for info in search_results.values():
+                print(f"{info['title']}: {info['rating']}/10 "
+                      f"({info['year']})")
         else:
             print("No results found in Fuzzy search as-well.")
 
+    def find_movies(self, search_query: str) -> dict:
+        """Returns the movies whose name contains the search query,
+        searching inside the storage when it supports it.
+        """
+        if hasattr(self.storage, 'search_movies'):
+            return self.storage.search_movies(search_query)
+        search_index = self.get_search_index()
+        return {movie_name: search_index.get(movie_name)
+                for movie_name in search_index.search(search_query)}
+
+    def get_search_index(self) -> SearchIndex:
+        """Returns the search index of the movies names, building it from
+        the storage on first use or after the storage was changed outside
+        of the app"""
+        self.check_storage_changes()
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.storage.iter_movies())
+        return self._search_index
+
     # ==================== Action 8. Sort and print movies =====================
-    def sort_movies(self, is_descending=True) -> None:
+    def sort_movies(self, is_descending=True, sort_fields=('rating',),
+                    offset=0, limit=None) -> None:
         """Print movies in a sorted order, by default in descending
-        order by rating.
+        order by rating. Movies can be sorted by several of rating, year
+        and title, equal movies keep the storage order. Offset and limit
+        select a page of the sorted movies.
         """
+        self.list_movies(movie_data=self.get_sorted_movies(
+            is_descending, sort_fields, offset, limit))
+
+    def get_sorted_movies(self, is_descending=True, sort_fields=('rating',),
+                          offset=0, limit=None) -> dict:
+        """Returns a page of the sorted movies as a dict, see sort_movies"""
+        sort_fields = tuple(sort_fields)
+        end = None if limit is None else offset + limit
+        if hasattr(self.storage, 'top_movies') and sort_fields == ('rating',):
+            sorted_dict = self.storage.top_movies(limit=end,
+                                                  is_descending=is_descending)
+            return dict(list(sorted_dict.items())[offset:])
+        self.check_storage_changes()
         movies = self.storage.list_movies()
-        sorted_list = sorted(movies.items(), key=lambda x: x[1]['rating'],
-                             reverse=is_descending)
-        sorted_dict = {key[0]: key[1] for key in sorted_list}
-        self.list_movies(movie_data=sorted_dict)
+        page = self._sorted_index.get_page(movies, sort_fields, is_descending,
+                                           offset, limit)
+        return {key: movies[key] for key in page}
 
     # ======================= Action 9. Save histogram =========================
-    def generate_histogram(self, file_name: str = 'histogram') -> None:
-        """Generate histogram image from movies ratings in json file"""
-        movies = self.storage.list_movies()
-        ratings = [val['rating'] for key, val in movies.items()]
-        plt.hist(ratings, bins=range(10))
-        plt.xlabel('Ratings')
-        plt.ylabel('Amount of Movies')
-        plt.savefig(f'{file_name}.png')
-        print(f"Rating histogram '{file_name}.png' is ready.")
+    def generate_histogram(self, file_name: str = 'histogram',
+                           charts=('ratings',)) -> None:
+        """Generate histogram images from the movies, the ratings histogram
+        by default, skipping charts whose data didn't change"""
+        rating_counts = None
+        if 'ratings' in charts and hasattr(self.storage, 'rating_histogram'):
+            rating_counts = self.storage.rating_histogram(RATING_BINS)
+        generator = HistogramGenerator()
+        results = generator.generate(self.storage.iter_movies(), charts,
+                                     file_name, rating_counts)
+        for path, rendered in results.items():
+            state = "is ready" if rendered else "is up to date"
+            print(f"Histogram '{os.path.basename(path)}' {state}.")
 
     # ===================== Action 10. Generate a website ======================
-    def generate_website(self) -> None:
-        """Generate a html file from the index template, serialize data from
-        json file and embed serialized data in the new html file
+    def generate_website(self, per_page=None) -> None:
+        """Generate a html file from the index template and the stored
+        movies. The movies are streamed into the page one by one, with
+        per_page into pages of per_page movies.
         """
-        movies = self.storage.list_movies()
-        generator = WebGenerator(movies)
-        generator.generate_web_page()
-        print("Website was successfully generated.")
+        generator = WebGenerator(self.storage.iter_movies())
+        pages = generator.stream_web_pages(per_page=per_page)
+        if not generator.written_count:
+            print("Website is already up to date.")
+        elif per_page:
+            print(f"Website was successfully generated, {pages} pages.")
+        else:
+            print("Website was successfully generated.")
+
+    # ======================= Action 11. Bulk import ===========================
+    def bulk_import(self, file_path=None) -> None:
+        """Imports all movie titles listed in a file, one title per line.
+        If file path is not provided asks the user, '-' reads from stdin.
+        Titles are fetched concurrently and saved in a single write.
+        """
+        from commands.bulk_import import BulkImporter
+        if file_path is None:
+            file_path = input("Enter path of the titles file: ")
+        try:
+            if file_path == '-':
+                titles = BulkImporter.read_titles(sys.stdin)
+            else:
+                with open(file_path, 'r', encoding='utf-8') as file:
+                    titles = BulkImporter.read_titles(file)
+        except OSError as error:
+            print(f"Couldn't read titles file: {error}")
+            return
+
+        importer = BulkImporter(self.storage, cache=self.api_cache)
+        new_movies, failures, existing = importer.import_titles(titles)
+        self.update_indexes(changed=new_movies)
+        for title, error in failures.items():
+            print(f"Failed to add '{title}': {error}")
+        print(f"{len(new_movies)} movies added, {len(failures)} failed, "
+              f"{len(existing)} already existed")
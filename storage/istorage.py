@@ -1,8 +1,14 @@
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 
 
 class IStorage(ABC):
-    """Persistent storage management abstract class"""
+    """Persistent storage management abstract class.
+    Storages add the bytes they read from and write to their files to
+    bytes_read and bytes_written, which the profiler reports."""
+    bytes_read = 0
+    bytes_written = 0
+
     @abstractmethod
     def list_movies(self):
         """Returns a dictionary of dictionaries that
@@ -24,6 +30,21 @@ class IStorage(ABC):
         }
         """
 
+    def get_movie(self, title):
+        """Returns the movie dict of the title, None if it's not in the
+        database. Storages that can look up one movie override this, by
+        default it looks in list_movies().
+        """
+        return self.list_movies().get(title)
+
+    def iter_movies(self):
+        """Yields (title, movie dict) pairs of the movies in the database.
+        Storages that can read their movies one by one override this to
+        avoid loading the whole dictionary, by default it iterates over
+        list_movies().
+        """
+        return iter(self.list_movies().items())
+
     @abstractmethod
     def add_movie(self, movie_dict):
         """Adds a movie to the storage file.
@@ -44,3 +65,27 @@ class IStorage(ABC):
         Loads the information from the storage file, updates the movie,
         and saves it back to file. The function doesn't validate the input.
         """
+
+    def flush(self):
+        """Writes any pending changes to the storage file.
+        Storages that write every change straight away have nothing to
+        flush, so by default this does nothing.
+        """
+
+    @contextmanager
+    def batch(self):
+        """Groups the changes made inside the with block, so storages can
+        write them together, e.g. in one transaction or one save. By
+        default changes are written as they are made and flushed when the
+        block ends.
+        """
+        try:
+            yield self
+        finally:
+            self.flush()
+
+    def data_files(self):
+        """Returns the paths of the files holding the storage data, used
+        to notice changes to the data. By default there are none.
+        """
+        return []
@@ -0,0 +1,354 @@
+import math
+from array import array
+from collections.abc import MutableMapping
+
+TABLE_FIELDS = ('title', 'rating', 'year', 'genre', 'img', 'director',
+                'country', 'alpha_2', 'imdbID')
+ENCODED_FIELDS = ('genre', 'director', 'country', 'alpha_2')
+EMPTY, DELETED = -1, -2
+
+
+class StringHeap:
+    """Column of optional strings stored as utf-8 bytes in one bytearray.
+    Replacing a string appends the new bytes and leaves the old ones."""
+    def __init__(self):
+        self._data = bytearray()
+        self._starts = array('I')
+        self._lengths = array('i')
+
+    def append(self, value) -> None:
+        self._starts.append(0)
+        self._lengths.append(-1)
+        self.set(len(self._starts) - 1, value)
+
+    def set(self, row: int, value) -> None:
+        if value is None:
+            self._lengths[row] = -1
+            return
+        encoded = value.encode()
+        self._starts[row] = len(self._data)
+        self._lengths[row] = len(encoded)
+        self._data += encoded
+
+    def get(self, row: int):
+        length = self._lengths[row]
+        if length < 0:
+            return None
+        start = self._starts[row]
+        return self._data[start:start + length].decode()
+
+
+class StringDictionary:
+    """Column of optional strings stored as codes into a list of the
+    distinct values, for fields that repeat a lot like genre or country"""
+    def __init__(self):
+        self._values = [None]
+        self._codes_by_value = {None: 0}
+        self._codes = array('I')
+
+    def get_code(self, value) -> int:
+        code = self._codes_by_value.get(value)
+        if code is None:
+            code = self._codes_by_value[value] = len(self._values)
+            self._values.append(value)
+        return code
+
+    def append(self, value) -> None:
+        self._codes.append(self.get_code(value))
+
+    def set(self, row: int, value) -> None:
+        self._codes[row] = self.get_code(value)
+
+    def get(self, row: int):
+        return self._values[self._codes[row]]
+
+
+class MovieRecord(MutableMapping):
+    """Dict compatible view of one movie row of a MovieTable"""
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, field):
+        return self._table.get_field(self._row, field)
+
+    def __setitem__(self, field, value):
+        self._table.set_field(self._row, field, value)
+
+    def __delitem__(self, field):
+        self._table.delete_field(self._row, field)
+
+    def __iter__(self):
+        return self._table.iter_fields(self._row)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class MovieTable(MutableMapping):
+    """Compact, dict compatible table of movies, stored by column.
+
+    Ratings are kept in an array('f'), years in an array('H'), genre,
+    director, country and alpha_2 are dictionary encoded, and the other
+    strings are packed as utf-8 in byte heaps. Poster urls are split into a
+    dictionary encoded folder and the file name. Movie keys aren't stored
+    when they are the lowercase title, lookups go through an open
+    addressing hash table of row numbers. Values that don't fit their
+    column, and fields outside TABLE_FIELDS such as notes, are kept in a
+    per-row dict. Ratings are rounded to the 7 significant digits of a
+    float32.
+
+    Indexing the table returns a MovieRecord view of the row, which reads
+    and writes through to the table like a movie dict.
+    """
+    def __init__(self, movies=()):
+        self._titles = StringHeap()
+        self._ratings = array('f')
+        self._years = array('H')
+        self._encoded = {field: StringDictionary() for field in ENCODED_FIELDS}
+        self._img_folders = StringDictionary()
+        self._img_names = StringHeap()
+        self._imdb_ids = StringHeap()
+        self._extras = {}
+        self._other_keys = {}
+        self._deleted = bytearray()
+        self._slots = array('i', [EMPTY] * 8)
+        self._used_slots = 0
+        self._size = 0
+        for key, movie in (movies.items() if hasattr(movies, 'items')
+                           else movies):
+            self[key] = movie
+
+    # ----------------------------- key lookups -----------------------------
+    def get_key(self, row: int) -> str:
+        key = self._other_keys.get(row)
+        if key is None:
+            key = self._titles.get(row).lower()
+        return key
+
+    def find_slot(self, key: str) -> tuple:
+        """Returns the slot of the key and its row, or the first free slot
+        for the key and None"""
+        if self._slots is None:
+            capacity = 8
+            while capacity < self._size * 2 + 2:
+                capacity *= 2
+            self.rebuild_slots(capacity)
+        mask = len(self._slots) - 1
+        slot = hash(key) & mask
+        free_slot = None
+        while True:
+            row = self._slots[slot]
+            if row == EMPTY:
+                return (slot if free_slot is None else free_slot), None
+            if row == DELETED:
+                if free_slot is None:
+                    free_slot = slot
+            elif self.get_key(row) == key:
+                return slot, row
+            slot = (slot + 1) & mask
+
+    def rebuild_slots(self, capacity: int) -> None:
+        """Rebuilds the hash table of the live rows with capacity slots"""
+        self._slots = array('i', [EMPTY] * capacity)
+        mask = capacity - 1
+        self._used_slots = 0
+        for row, deleted in enumerate(self._deleted):
+            if deleted:
+                continue
+            slot = hash(self.get_key(row)) & mask
+            while self._slots[slot] != EMPTY:
+                slot = (slot + 1) & mask
+            self._slots[slot] = row
+            self._used_slots += 1
+
+    def __getstate__(self):
+        """Pickles the columns without the hash table, since string hashes
+        differ between processes"""
+        state = self.__dict__.copy()
+        del state['_slots']
+        return state
+
+    def __setstate__(self, state):
+        """Restores the columns, the hash table is rebuilt on the first
+        key lookup"""
+        self.__dict__.update(state)
+        self._slots = None
+
+    # --------------------------- mapping methods ---------------------------
+    def __getitem__(self, key):
+        _, row = self.find_slot(key)
+        if row is None:
+            raise KeyError(key)
+        return MovieRecord(self, row)
+
+    def __setitem__(self, key, movie):
+        slot, row = self.find_slot(key)
+        if row is None:
+            row = self.append_row()
+            self._slots[slot] = row
+            self._used_slots += 1
+            self._size += 1
+        else:
+            for field in TABLE_FIELDS:
+                self.clear_column(row, field)
+            self._extras.pop(row, None)
+        self._other_keys[row] = key
+        for field, value in movie.items():
+            self.set_field(row, field, value)
+        if self._used_slots * 2 > len(self._slots):
+            self.rebuild_slots(len(self._slots) * 2)
+
+    def __delitem__(self, key):
+        slot, row = self.find_slot(key)
+        if row is None:
+            raise KeyError(key)
+        self._slots[slot] = DELETED
+        self._deleted[row] = 1
+        self._extras.pop(row, None)
+        self._other_keys.pop(row, None)
+        self._size -= 1
+
+    def __iter__(self):
+        for row, deleted in enumerate(self._deleted):
+            if not deleted:
+                yield self.get_key(row)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        return self.find_slot(key)[1] is not None
+
+    def items(self):
+        for row, deleted in enumerate(self._deleted):
+            if not deleted:
+                yield self.get_key(row), MovieRecord(self, row)
+
+    def values(self):
+        for row, deleted in enumerate(self._deleted):
+            if not deleted:
+                yield MovieRecord(self, row)
+
+    def __repr__(self):
+        return f'MovieTable({len(self)} movies)'
+
+    # ---------------------------- row storage ------------------------------
+    def append_row(self) -> int:
+        """Appends an empty row and returns its number"""
+        for column in (self._titles, self._img_folders, self._img_names,
+                       self._imdb_ids, *self._encoded.values()):
+            column.append(None)
+        self._ratings.append(math.nan)
+        self._years.append(0)
+        self._deleted.append(0)
+        return len(self._deleted) - 1
+
+    @staticmethod
+    def fits_column(field: str, value) -> bool:
+        """Returns True if the value can be stored in the field's column"""
+        if field == 'rating':
+            return isinstance(value, (int, float)) and \
+                not isinstance(value, bool) and not math.isnan(value)
+        if field == 'year':
+            return isinstance(value, int) and not isinstance(value, bool) \
+                and 0 < value < 65536
+        return field in TABLE_FIELDS and isinstance(value, str)
+
+    def set_field(self, row: int, field: str, value) -> None:
+        if not self.fits_column(field, value):
+            if field in TABLE_FIELDS:
+                self.clear_column(row, field)
+            self._extras.setdefault(row, {})[field] = value
+            return
+        self._extras.get(row, {}).pop(field, None)
+        if field == 'title':
+            key = self.get_key(row)
+            self._titles.set(row, value)
+            if key == value.lower():
+                self._other_keys.pop(row, None)
+            else:
+                self._other_keys[row] = key
+        elif field == 'rating':
+            self._ratings[row] = value
+        elif field == 'year':
+            self._years[row] = value
+        elif field == 'img':
+            # A value without a folder is kept whole, with no folder
+            folder, slash, name = value.rpartition('/')
+            self._img_folders.set(row, folder if slash else None)
+            self._img_names.set(row, name)
+        elif field == 'imdbID':
+            self._imdb_ids.set(row, value)
+        else:
+            self._encoded[field].set(row, value)
+
+    def clear_column(self, row: int, field: str) -> None:
+        """Empties the field's column in the row"""
+        if field == 'rating':
+            self._ratings[row] = math.nan
+        elif field == 'year':
+            self._years[row] = 0
+        elif field == 'img':
+            self._img_folders.set(row, None)
+            self._img_names.set(row, None)
+        elif field == 'imdbID':
+            self._imdb_ids.set(row, None)
+        elif field == 'title':
+            if self._titles.get(row) is not None:
+                self._other_keys[row] = self.get_key(row)
+                self._titles.set(row, None)
+        else:
+            self._encoded[field].set(row, None)
+
+    def get_column(self, row: int, field: str):
+        """Returns the field's value from its column, None if empty"""
+        if field == 'title':
+            return self._titles.get(row)
+        if field == 'rating':
+            rating = self._ratings[row]
+            return None if math.isnan(rating) else float(f'{rating:.7g}')
+        if field == 'year':
+            return self._years[row] or None
+        if field == 'img':
+            name = self._img_names.get(row)
+            folder = self._img_folders.get(row)
+            if name is None or folder is None:
+                return name
+            return f'{folder}/{name}'
+        if field == 'imdbID':
+            return self._imdb_ids.get(row)
+        return self._encoded[field].get(row)
+
+    def get_field(self, row: int, field: str):
+        extras = self._extras.get(row)
+        if extras is not None and field in extras:
+            return extras[field]
+        value = self.get_column(row, field) if field in TABLE_FIELDS \
+            else None
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def delete_field(self, row: int, field: str) -> None:
+        extras = self._extras.get(row)
+        if extras is not None and field in extras:
+            del extras[field]
+        elif field in TABLE_FIELDS and self.get_column(row, field) is not None:
+            self.clear_column(row, field)
+        else:
+            raise KeyError(field)
+
+    def iter_fields(self, row: int):
+        extras = self._extras.get(row, {})
+        for field in TABLE_FIELDS:
+            if field in extras or self.get_column(row, field) is not None:
+                yield field
+        for field in extras:
+            if field not in TABLE_FIELDS:
+                yield field
@@ -0,0 +1,322 @@
+import json
+import math
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+from contextlib import contextmanager
+from .istorage import IStorage
+from .movie_table import ENCODED_FIELDS, TABLE_FIELDS, MovieTable
+
+MAGIC = b'MVDB'
+VERSION = 1
+# magic, version, movie count, offsets of the records, key index and heap
+HEADER = struct.Struct('<4sHxxIQQQ')
+STRING_FIELDS = ('key', 'title', 'genre', 'img', 'director', 'country',
+                 'alpha_2', 'imdbID', 'extra')
+# rating, year, then an (offset, length) heap reference per string field
+RECORD = struct.Struct('<fHxx' + 'II' * len(STRING_FIELDS))
+INDEX_ITEM = struct.Struct('<I')
+MISSING = 0xFFFFFFFF
+
+
+class BinaryMovie(Mapping):
+    """Read only movie dict view of a record, fields are decoded from the
+    mapped file when they are accessed"""
+    __slots__ = ('_snapshot', '_values', '_extra')
+
+    def __init__(self, snapshot, record):
+        self._snapshot = snapshot
+        self._values = record
+        self._extra = None
+
+    def get_string(self, field):
+        index = 2 + 2 * STRING_FIELDS.index(field)
+        return self._snapshot.read_string(self._values[index],
+                                          self._values[index + 1])
+
+    def get_extra(self) -> dict:
+        """Returns the fields kept as json, decoded on first use"""
+        if self._extra is None:
+            extra = self.get_string('extra')
+            self._extra = json.loads(extra) if extra else {}
+        return self._extra
+
+    def get_column(self, field):
+        if field == 'rating':
+            rating = self._values[0]
+            return None if math.isnan(rating) else float(f'{rating:.7g}')
+        if field == 'year':
+            return self._values[1] or None
+        return self.get_string(field)
+
+    def __getitem__(self, field):
+        if field in TABLE_FIELDS:
+            value = self.get_column(field)
+            if value is not None:
+                return value
+        return self.get_extra()[field]
+
+    def __iter__(self):
+        extra = self.get_extra() if self._values[-1] != MISSING else {}
+        for field in TABLE_FIELDS:
+            if field in extra or self.get_column(field) is not None:
+                yield field
+        for field in extra:
+            if field not in TABLE_FIELDS:
+                yield field
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class BinarySnapshot(Mapping):
+    """Read only dict view of a binary movies file mapped in memory.
+    Nothing is parsed when it's opened, keys are found by a binary search
+    over the sorted key index and records are decoded on access.
+    """
+    def __init__(self, file_path):
+        with open(file_path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self._count, self._records_offset,
+         self._index_offset, self._heap_offset) = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{file_path}' isn't a binary movies file")
+
+    def read_string(self, offset, length):
+        if length == MISSING:
+            return None
+        start = self._heap_offset + offset
+        return self._map[start:start + length].decode()
+
+    def read_record(self, number):
+        return RECORD.unpack_from(
+            self._map, self._records_offset + number * RECORD.size)
+
+    def read_key_bytes(self, number):
+        offset, length = self.read_record(number)[2:4]
+        start = self._heap_offset + offset
+        return self._map[start:start + length]
+
+    def find_record(self, key):
+        """Returns the record number of the key, None if it's missing"""
+        key_bytes = key.encode()
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            number = INDEX_ITEM.unpack_from(
+                self._map, self._index_offset + middle * INDEX_ITEM.size)[0]
+            middle_key = self.read_key_bytes(number)
+            if middle_key == key_bytes:
+                return number
+            if middle_key < key_bytes:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def __getitem__(self, key):
+        number = self.find_record(key) if isinstance(key, str) else None
+        if number is None:
+            raise KeyError(key)
+        return BinaryMovie(self, self.read_record(number))
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self.find_record(key) is not None
+
+    def __iter__(self):
+        for key, _ in self.items():
+            yield key
+
+    def __len__(self):
+        return self._count
+
+    def items(self):
+        for number in range(self._count):
+            record = self.read_record(number)
+            yield self.read_string(record[2], record[3]), \
+                BinaryMovie(self, record)
+
+    def values(self):
+        for _, movie in self.items():
+            yield movie
+
+    def __repr__(self):
+        return f'BinarySnapshot({self._count} movies)'
+
+
+class StorageBinary(IStorage):
+    """Binary storage class, allows the movie app use a memory mapped file.
+
+    The file holds fixed width records with the rating and year and
+    references into a heap of utf-8 strings, followed by the record numbers
+    sorted by key. Opening it maps the file without parsing, so even large
+    catalogues are available in milliseconds. The movies are returned as
+    read only dict views, decoded when accessed. Every change rewrites the
+    whole snapshot, so the format suits catalogues that are read much more
+    than they are changed, e.g. converted from json or csv with
+    main.py --convert.
+    """
+    def __init__(self, file_path):
+        self._file_path = file_path
+        self._snapshot = None
+        self._file_stamp = None
+        self._in_batch = False
+        self._batch_movies = None
+        if not os.path.isfile(file_path):
+            self.save_snapshot(())
+
+    def save_snapshot(self, items):
+        """Writes the (key, movie dict) pairs to the binary file"""
+        heap = bytearray()
+        shared_strings = {}
+        records = bytearray()
+        keys = []
+
+        def add_string(value, shared=False):
+            if value is None:
+                return 0, MISSING
+            if shared and value in shared_strings:
+                return shared_strings[value]
+            encoded = value.encode()
+            reference = len(heap), len(encoded)
+            heap.extend(encoded)
+            if shared:
+                shared_strings[value] = reference
+            return reference
+
+        for key, movie in items:
+            extra = {}
+            columns = {}
+            for field, value in movie.items():
+                if MovieTable.fits_column(field, value):
+                    columns[field] = value
+                else:
+                    extra[field] = value
+            columns['key'] = key
+            if extra:
+                columns['extra'] = json.dumps(extra)
+            references = []
+            for field in STRING_FIELDS:
+                references.extend(add_string(columns.get(field),
+                                             field in ENCODED_FIELDS))
+            records.extend(RECORD.pack(columns.get('rating', math.nan),
+                                       columns.get('year', 0), *references))
+            keys.append(key.encode())
+
+        index = sorted(range(len(keys)), key=keys.__getitem__)
+        records_offset = HEADER.size
+        index_offset = records_offset + len(records)
+        heap_offset = index_offset + len(index) * INDEX_ITEM.size
+        temp_path = f'{self._file_path}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, len(keys), records_offset,
+                                   index_offset, heap_offset))
+            file.write(records)
+            file.write(struct.pack(f'<{len(index)}I', *index))
+            file.write(heap)
+            self.bytes_written += file.tell()
+        os.replace(temp_path, self._file_path)
+        self._snapshot = None
+
+    def get_file_stamp(self):
+        """Returns the modification time and size of the binary file"""
+        file_stat = os.stat(self._file_path)
+        return file_stat.st_mtime_ns, file_stat.st_size
+
+    def data_files(self):
+        """Returns the paths of the files holding the storage data"""
+        return [self._file_path]
+
+    def list_movies(self):
+        """Returns a read only dictionary view of dictionary views that
+        contains the movies information in the database. The file is
+        mapped again only if it was changed since the last call.
+
+        For example, the function may return:
+        {
+          "titanic": {
+            "title": "Titanic",
+            "rating": 9,
+            "year": 1999
+            ...
+          },
+          "..." {
+            ...
+          },
+        }
+        """
+        if self._batch_movies is not None:
+            return self._batch_movies
+        file_stamp = self.get_file_stamp()
+        if self._snapshot is None or file_stamp != self._file_stamp:
+            self._snapshot = BinarySnapshot(self._file_path)
+            self._file_stamp = file_stamp
+        return self._snapshot
+
+    def iter_movies(self):
+        """Yields (title, movie view) pairs in the order they were added"""
+        return self.list_movies().items()
+
+    def copy_movies(self):
+        """Returns the movies as a dictionary of dictionaries to change.
+        Inside a batch the copy is made once and kept for the batch."""
+        if self._batch_movies is not None:
+            return self._batch_movies
+        movies_data = {key: dict(movie) for key, movie in self.iter_movies()}
+        if self._in_batch:
+            self._batch_movies = movies_data
+        return movies_data
+
+    def save_changes(self, movies_data):
+        """Saves the changed movies, inside a batch they are saved when the
+        batch ends"""
+        if not self._in_batch:
+            self.save_snapshot(movies_data.items())
+
+    @contextmanager
+    def batch(self):
+        """Copies the movies on the first change in the with block, applies
+        the changes to the copy and writes the snapshot once at the end"""
+        if self._in_batch:
+            yield self
+            return
+        self._in_batch = True
+        try:
+            yield self
+        finally:
+            movies_data, self._batch_movies = self._batch_movies, None
+            self._in_batch = False
+            if movies_data is not None:
+                self.save_snapshot(movies_data.items())
+
+    def add_movie(self, movie_dict):
+        """Adds a movie to the movies database.
+        Loads the information from the binary file, add the movie,
+        and saves it. The function doesn't need to validate the input.
+        """
+        movies_data = self.copy_movies()
+        movies_data.update(movie_dict)
+        self.save_changes(movies_data)
+
+    def delete_movie(self, title):
+        """Deletes a movie from the movies database.
+        Loads the information from the binary file, deletes the movie,
+        and saves it. The function doesn't need to validate the input.
+        """
+        movies_data = self.copy_movies()
+        del movies_data[title]
+        self.save_changes(movies_data)
+
+    def update_movie(self, title, value, key="note"):
+        """Updates a movie from the movies database.
+        Loads the information from the binary file, updates the movie,
+        and saves it. The function doesn't need to validate the input.
+        """
+        movies_data = self.copy_movies()
+        movies_data[title][key] = value
+        self.save_changes(movies_data)
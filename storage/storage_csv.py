@@ -1,3 +1,6 @@
+import csv
+import os
+from contextlib import contextmanager
 import pandas as pd
 from os.path import isfile
 
@@ -5,24 +8,85 @@ import pandas.errors
 
 from .istorage import IStorage
 
+CSV_DTYPES = {'title': str, 'rating': 'float64', 'year': 'Int64',
+              'genre': str, 'img': str, 'director': str, 'country': str,
+              'alpha_2': str, 'imdbID': str, 'note': str}
+DELETED_COLUMN = '_deleted'
+
 
 class StorageCsv(IStorage):
-    """CSV storage class, allows the movie app use csv format storage"""
-    def __init__(self, file_path):
+    """CSV storage class, allows the movie app use csv format storage.
+
+    Changes are appended to the file instead of rewriting it: a new or
+    updated movie is written as a new row that overrides earlier rows with
+    the same title, and a deleted movie as a tombstone row marked in the
+    _deleted column. list_movies resolves these rows, and compact() rewrites
+    the file without them. The file is compacted automatically once the
+    overridden and tombstone rows pass compact_ratio of the movies rows.
+    A movie with a field that isn't a csv column yet is saved by a rewrite.
+
+    The rows read or written last are kept with the file stamp, so an update
+    appends the changed row without reading the file again, as long as no
+    one else changed the file.
+    """
+    def __init__(self, file_path, compact_ratio=0.5):
         self._file_path = file_path
+        self._compact_ratio = compact_ratio
+        self._movie_rows = None
+        self._extra_rows = 0
+        self._batch_movies = None
+        self._batch_changed = False
+        self._rows = None
+        self._rows_stamp = None
         if not isfile(file_path):
             self.save_to_csv({})
 
     def save_to_csv(self, data):
         """Saves the provided data to a csv data file"""
-        data_list = []
-        headers = set()
-        for key, value in data.items():
-            headers.update(value.keys())
-            data_list.append(value)
-
-        df = pd.DataFrame(data_list, columns=list(headers))
+        df = pd.DataFrame.from_records(list(data.values()))
+        df[DELETED_COLUMN] = None
         df.to_csv(self._file_path, index=False)
+        self.bytes_written += os.path.getsize(self._file_path)
+        self._movie_rows = len(data)
+        self._extra_rows = 0
+        self.cache_rows(data, self.get_file_stamp())
+
+    def get_file_stamp(self):
+        """Returns the modification time and size of the csv file, used to
+        notice changes made by other processes.
+        """
+        file_stat = os.stat(self._file_path)
+        return file_stat.st_mtime_ns, file_stat.st_size
+
+    def cache_rows(self, movies_data, file_stamp):
+        """Keeps a copy of the movies rows of the file with the given stamp"""
+        self._rows = {key: dict(row) for key, row in movies_data.items()}
+        self._rows_stamp = file_stamp
+
+    def get_cached_rows(self):
+        """Returns the cached movies rows, None if the file changed since"""
+        if self._rows is not None and \
+                self._rows_stamp == self.get_file_stamp():
+            return self._rows
+        return None
+
+    def read_csv(self):
+        """Reads the csv data file into a DataFrame. Text columns are read
+        as strings, the rating as float and the year as a nullable integer,
+        so tombstone rows don't turn it into a float. Other columns are
+        inferred by pandas.
+        """
+        self.bytes_read += os.path.getsize(self._file_path)
+        return pd.read_csv(self._file_path, dtype=CSV_DTYPES)
+
+    def read_header(self):
+        """Returns the list of columns in the csv data file"""
+        with open(self._file_path, 'r', newline='') as file:
+            return next(csv.reader(file), [])
+
+    def data_files(self):
+        """Returns the paths of the files holding the storage data"""
+        return [self._file_path]
 
     def list_movies(self):
         """Returns a dictionary of dictionaries that
@@ -43,44 +107,162 @@ class StorageCsv(IStorage):
           },
         }
         """
-        movies_data = {}
+        if self._batch_movies is not None:
+            return self._batch_movies
+        # The stamp is taken first, so a change made while reading leaves
+        # the cached rows outdated instead of looking current
+        file_stamp = self.get_file_stamp()
+        movies_data = self.read_movies()
+        self.cache_rows(movies_data, file_stamp)
+        return movies_data
+
+    def read_movies(self):
+        """Reads the movies of the csv data file, resolving the overridden
+        and tombstone rows"""
         try:
-            df = pd.read_csv(self._file_path)
+            df = self.read_csv()
         except pandas.errors.EmptyDataError:
-            return movies_data
+            return {}
+        if df.empty:
+            self._movie_rows, self._extra_rows = 0, 0
+            return {}
 
-        for i, row in df.iterrows():
-            movie_dict = {}
-            for key in df.columns:
-                if pd.notna(row[key]):
-                    movie_dict[key] = row[key]
-            movies_data[row["title"].lower()] = movie_dict
+        if DELETED_COLUMN in df:
+            is_deleted = df.pop(DELETED_COLUMN).notna().to_numpy()
+        else:
+            is_deleted = [False] * len(df)
+        keys = df["title"].str.lower()
+        records = df.to_dict('records')
+        not_empty = df.notna().to_numpy()
+        if keys.is_unique and not any(is_deleted) and not_empty.all():
+            self._movie_rows, self._extra_rows = len(df), 0
+            return dict(zip(keys, records))
 
+        # Only rows with empty cells need to drop some of their columns.
+        # Later rows override earlier ones and tombstones delete them.
+        columns = list(df.columns)
+        full_rows = not_empty.all(axis=1)
+        movies_data = {}
+        for key, record, is_full, row_mask, deleted in zip(
+                keys, records, full_rows, not_empty, is_deleted):
+            if deleted:
+                movies_data.pop(key, None)
+                continue
+            if not is_full:
+                record = {column: record[column] for column, keep
+                          in zip(columns, row_mask) if keep}
+            movies_data[key] = record
+
+        self._movie_rows = len(movies_data)
+        self._extra_rows = len(df) - len(movies_data)
         return movies_data
 
+    def append_rows(self, rows, new_movies=0, extra_rows=0):
+        """Appends rows to the csv data file if all their fields are csv
+        columns and returns True, otherwise returns False. Compacts the file
+        when the rows that don't hold a movie pass the compact ratio.
+        """
+        header = self.read_header()
+        if DELETED_COLUMN not in header or \
+                any(column not in header for row in rows for column in row):
+            return False
+
+        cached_rows = self.get_cached_rows()
+        with open(self._file_path, 'a', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=header,
+                                    lineterminator=os.linesep)
+            start = file.tell()
+            writer.writerows(rows)
+            self.bytes_written += file.tell() - start
+        if cached_rows is not None:
+            for row in rows:
+                # Empty cells are left out, like list_movies does
+                if row.get(DELETED_COLUMN):
+                    cached_rows.pop(row['title'].lower(), None)
+                else:
+                    cached_rows[row['title'].lower()] = {
+                        column: value for column, value in row.items()
+                        if value is not None and value != ''}
+            self._rows_stamp = self.get_file_stamp()
+
+        if self._movie_rows is not None:
+            self._movie_rows += new_movies
+            self._extra_rows += extra_rows
+            if self._extra_rows > self._compact_ratio * max(self._movie_rows,
+                                                            1):
+                self.compact()
+        return True
+
+    def compact(self):
+        """Rewrites the csv data file without overridden and deleted rows"""
+        self.save_to_csv(self.list_movies())
+
+    @contextmanager
+    def batch(self):
+        """Loads the movies once, applies the changes made in the with block
+        to them in memory and saves the file once at the end"""
+        if self._batch_movies is not None:
+            yield self
+            return
+        self._batch_movies = self.list_movies()
+        self._batch_changed = False
+        try:
+            yield self
+        finally:
+            movies_data, self._batch_movies = self._batch_movies, None
+            if self._batch_changed:
+                self.save_to_csv(movies_data)
+
     def add_movie(self, movie_dict):
         """Adds a movie to the storage file.
-        Loads the information from the storage file, add the movie,
-        and saves it back to file. The function doesn't validate the input.
+        Appends the movie as a new row, or if it has new fields, loads the
+        information from the storage file, adds the movie, and saves it back
+        to file. The function doesn't validate the input.
         """
+        if self._batch_movies is not None:
+            self._batch_movies.update(movie_dict)
+            self._batch_changed = True
+            return
+        if self.append_rows(list(movie_dict.values()),
+                            new_movies=len(movie_dict)):
+            return
         movies_data = self.list_movies()
         movies_data.update(movie_dict)
         self.save_to_csv(movies_data)
 
     def delete_movie(self, title):
         """Deletes a movie from the storage file.
-        Loads the information from the storage file, deletes the movie,
-        and saves it back to file. The function doesn't validate the input.
+        Appends a tombstone row for the movie, or rewrites the file if it has
+        no tombstone column. The function doesn't validate the input.
         """
+        if self._batch_movies is not None:
+            del self._batch_movies[title]
+            self._batch_changed = True
+            return
+        tombstone = {'title': title, DELETED_COLUMN: 1}
+        if self.append_rows([tombstone], new_movies=-1, extra_rows=2):
+            return
         movies_data = self.list_movies()
         del movies_data[title]
         self.save_to_csv(movies_data)
 
     def update_movie(self, title, value, key="note"):
         """Updates a movie from the storage file.
-        Loads the information from the storage file, updates the movie,
-        and saves it back to file. The function doesn't validate the input.
+        Takes the movie from the cached rows, or loads the information from
+        the storage file if it changed, updates the movie, and appends it as
+        a row that overrides the old one, or rewrites the file if the field
+        is new. The function doesn't validate the input.
         """
+        if self._batch_movies is not None:
+            self._batch_movies[title][key] = value
+            self._batch_changed = True
+            return
+        movies_data = self.get_cached_rows()
+        if movies_data is None:
+            movies_data = self.list_movies()
+        movie = {**movies_data[title], key: value}
+        if self.append_rows([movie], extra_rows=1):
+            return
         movies_data = self.list_movies()
         movies_data[title][key] = value
         self.save_to_csv(movies_data)
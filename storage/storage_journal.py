@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from os.path import isfile
+from .istorage import IStorage
+
+
+class StorageJournal(IStorage):
+    """Journal storage class, allows the movie app use an append-only log.
+
+    Every add, delete and update is appended to a log file next to the
+    snapshot file as a single json line, so a write costs the same no matter
+    how big the catalogue is. On open the movies are rebuilt from the latest
+    snapshot plus the log records written after it. A record cut off by a
+    crash is dropped, so at most the last write is lost. Once the log holds
+    more than compact_ratio records per movie, a background thread writes a
+    new snapshot and removes the records it covers from the log.
+    """
+    def __init__(self, file_path, compact_ratio=1.0, min_compact_records=1000,
+                 sync=True):
+        self._file_path = file_path
+        self._log_path = file_path + '.log'
+        self._compact_ratio = compact_ratio
+        self._min_compact_records = min_compact_records
+        self._sync = sync
+        self._lock = threading.Lock()
+        self._compactor = None
+        if not isfile(file_path):
+            self.save_snapshot({}, 0)
+        self._movies, self._seq = self.load_snapshot()
+        self._log_records = self.replay_log()
+        self._log_file = open(self._log_path, 'ab')
+
+    def save_snapshot(self, movies_data, seq):
+        """Saves the provided data and the last log sequence number it
+        includes to the snapshot file, replacing the old one atomically.
+        """
+        tmp_path = self._file_path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            file.write(json.dumps({'seq': seq, 'movies': movies_data}))
+            self.bytes_written += file.tell()
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self._file_path)
+
+    def load_snapshot(self):
+        """Returns the movies data and sequence number from the snapshot"""
+        with open(self._file_path, 'rb') as file:
+            data = file.read()
+        self.bytes_read += len(data)
+        snapshot = json.loads(data)
+        return snapshot['movies'], snapshot['seq']
+
+    def replay_log(self):
+        """Applies the log records newer than the snapshot to the movies data
+        and returns the amount of records in the log. A broken record at the
+        end of the log, left by a crash during a write, is cut off.
+        """
+        if not isfile(self._log_path):
+            return 0
+
+        records = 0
+        valid_size = 0
+        with open(self._log_path, 'rb') as file:
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record['seq'] > self._seq:
+                    self.apply_record(self._movies, record)
+                    self._seq = record['seq']
+                records += 1
+                valid_size += len(line)
+        self.bytes_read += valid_size
+
+        if valid_size != os.path.getsize(self._log_path):
+            with open(self._log_path, 'r+b') as file:
+                file.truncate(valid_size)
+        return records
+
+    @staticmethod
+    def apply_record(movies_data, record):
+        """Applies a single log record to the provided movies data. Updated
+        movies are replaced by a new dict so snapshot copies stay unchanged.
+        """
+        if record['op'] == 'add':
+            movies_data.update(record['movies'])
+        elif record['op'] == 'delete':
+            del movies_data[record['title']]
+        elif record['op'] == 'update':
+            movie = dict(movies_data[record['title']])
+            movie[record['key']] = record['value']
+            movies_data[record['title']] = movie
+
+    @contextmanager
+    def batch(self):
+        """Appends the records of the with block without syncing each of
+        them, the log is synced once at the end"""
+        sync = self._sync
+        self._sync = False
+        try:
+            yield self
+        finally:
+            self._sync = sync
+            if sync:
+                with self._lock:
+                    self._log_file.flush()
+                    os.fsync(self._log_file.fileno())
+
+    def append_record(self, record):
+        """Appends a record to the log, applies it to the movies data and
+        starts a compaction if the log has grown too long.
+        """
+        with self._lock:
+            record['seq'] = self._seq + 1
+            line = json.dumps(record).encode() + b'\n'
+            self._log_file.write(line)
+            self.bytes_written += len(line)
+            self._log_file.flush()
+            if self._sync:
+                os.fsync(self._log_file.fileno())
+            self._seq = record['seq']
+            self._log_records += 1
+            self.apply_record(self._movies, record)
+        self.maybe_compact()
+
+    def maybe_compact(self):
+        """Starts a background compaction when the log is too long compared
+        to the amount of movies and no compaction is running.
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        limit = max(self._min_compact_records,
+                    self._compact_ratio * len(self._movies))
+        if self._log_records < limit:
+            return
+        self._compactor = threading.Thread(target=self.compact, daemon=True)
+        self._compactor.start()
+
+    def compact(self):
+        """Writes a snapshot of the current movies data and removes the log
+        records it includes. Records appended while the snapshot is being
+        written are moved to the new log.
+        """
+        with self._lock:
+            movies_data = dict(self._movies)
+            seq = self._seq
+            log_offset = self._log_file.tell()
+        self.save_snapshot(movies_data, seq)
+
+        with self._lock:
+            self._log_file.close()
+            tmp_path = self._log_path + '.tmp'
+            with open(self._log_path, 'rb') as old_log, \
+                    open(tmp_path, 'wb') as new_log:
+                old_log.seek(log_offset)
+                tail = old_log.read()
+                new_log.write(tail)
+                new_log.flush()
+                os.fsync(new_log.fileno())
+            os.replace(tmp_path, self._log_path)
+            self._log_file = open(self._log_path, 'ab')
+            self._log_records = tail.count(b'\n')
+
+    def flush(self):
+        """Waits for a running compaction to finish"""
+        if self._compactor is not None:
+            self._compactor.join()
+
+    def data_files(self):
+        """Returns the paths of the files holding the storage data"""
+        return [self._file_path, self._log_path]
+
+    def list_movies(self):
+        """Returns a dictionary of dictionaries that
+        contains the movies information in the database.
+        The data is kept in memory, so the returned dictionary
+        shouldn't be changed by the caller.
+
+        For example, the function may return:
+        {
+          "titanic": {
+            "title": "Titanic",
+            "rating": 9,
+            "year": 1999
+            ...
+          },
+          "..." {
+            ...
+          },
+        }
+        """
+        return self._movies
+
+    def add_movie(self, movie_dict):
+        """Adds a movie to the movies database.
+        Appends an add record to the log. The function doesn't validate
+        the input.
+        """
+        self.append_record({'op': 'add', 'movies': movie_dict})
+
+    def delete_movie(self, title):
+        """Deletes a movie from the movies database.
+        Appends a delete record to the log. The function doesn't validate
+        the input.
+        """
+        self.append_record({'op': 'delete', 'title': title})
+
+    def update_movie(self, title, value, key="note"):
+        """Updates a movie from the movies database.
+        Appends an update record to the log. The function doesn't validate
+        the input.
+        """
+        self.append_record({'op': 'update', 'title': title,
+                            'key': key, 'value': value})
@@ -1,25 +1,91 @@
+import codecs
 import json
+import time
+from contextlib import contextmanager
+from os import stat
 from os.path import isfile
 from .istorage import IStorage
+from .movie_table import MovieTable
 
 
 class StorageJson(IStorage):
-    """Json storage class, allows the movie app use json format storage"""
-    def __init__(self, file_path):
+    """Json storage class, allows the movie app use json format storage.
+
+    With cache=True the file is loaded once and reads are served from memory.
+    Changed titles are tracked as dirty and written back together once
+    flush_every titles are dirty, once the oldest change is flush_interval
+    seconds old, or when flush() is called. There is no timer, the age is
+    only checked when the next change is saved, so the last changes of a
+    session are written by flush(). If another process changes the file,
+    the cache is reloaded and the pending changes are applied on top.
+    With compact=True as well, the cache is a columnar MovieTable built
+    while streaming the file, which takes a fraction of the memory of the
+    dictionaries.
+    """
+    def __init__(self, file_path, cache=False, flush_every=50,
+                 flush_interval=30.0, compact=False):
         self._file_path = file_path
+        self._cache = cache
+        self._compact = compact
+        self._flush_every = flush_every
+        self._flush_interval = flush_interval
+        self._movies = None
+        self._file_stamp = None
+        self._dirty = set()
+        self._dirty_since = None
+        self._batch_depth = 0
         if not isfile(file_path):
             self.save_to_json({})
 
     def save_to_json(self, data):
         """Saves the provided data to the json data file"""
         with open(self._file_path, 'w') as file:
-            file.write(json.dumps(data, indent=4))
+            if isinstance(data, dict):
+                file.write(json.dumps(data, indent=4))
+            else:
+                self.write_json_items(file, data.items())
+            self.bytes_written += file.tell()
+        if self._cache:
+            self._file_stamp = self.get_file_stamp()
+
+    @staticmethod
+    def write_json_items(file, items):
+        """Writes (key, movie) pairs as a json object one movie at a time,
+        in the same layout as json.dumps(data, indent=4)"""
+        separator = '{\n    '
+        for key, movie in items:
+            movie_json = json.dumps(dict(movie), indent=4)
+            movie_json = movie_json.replace('\n', '\n    ')
+            file.write(f"{separator}{json.dumps(key)}: {movie_json}")
+            separator = ',\n    '
+        file.write('{}' if separator.startswith('{') else '\n}')
+
+    def get_file_stamp(self):
+        """Returns the modification time and size of the json file,
+        used to notice changes made by other processes.
+        """
+        file_stat = stat(self._file_path)
+        return file_stat.st_mtime_ns, file_stat.st_size
+
+    def load_from_json(self):
+        """Loads and returns the data from the json data file"""
+        with open(self._file_path, 'rb') as file:
+            data = file.read()
+        self.bytes_read += len(data)
+        movie_data = json.loads(data)
+
+        return movie_data
+
+    def data_files(self):
+        """Returns the paths of the files holding the storage data"""
+        return [self._file_path]
 
     def list_movies(self):
         """Returns a dictionary of dictionaries that
         contains the movies information in the database.
         The function loads the information from the JSON
-        file and returns the data.
+        file and returns the data. In cache mode the cached dictionary
+        itself is returned, so it shouldn't be changed by the caller.
 
         For example, the function may return:
         {
@@ -34,10 +100,139 @@ class StorageJson(IStorage):
           },
         }
         """
-        with open(self._file_path, 'r') as file:
-            movie_data = json.loads(file.read())
+        if not self._cache:
+            return self.load_from_json()
 
-        return movie_data
+        file_stamp = self.get_file_stamp()
+        if self._movies is None or file_stamp != self._file_stamp:
+            self.reload_cache(file_stamp)
+        return self._movies
+
+    def iter_movies(self):
+        """Yields (title, movie dict) pairs of the movies in the database.
+        Without cache the JSON file is parsed one movie at a time, so only
+        a single movie and a chunk of the file are in memory at once.
+        """
+        if self._cache:
+            return iter(self.list_movies().items())
+        return self.stream_from_json()
+
+    def stream_from_json(self, chunk_size=1 << 16):
+        """Parses the top level object of the json file incrementally and
+        yields its (key, value) pairs"""
+        decoder = json.JSONDecoder()
+        # The file is read as bytes to count them, and decoded incrementally
+        text_decoder = codecs.getincrementaldecoder('utf-8')()
+        with open(self._file_path, 'rb') as file:
+            buffer = ''
+            position = 0
+
+            def read_more():
+                nonlocal buffer, position
+                chunk = file.read(chunk_size)
+                self.bytes_read += len(chunk)
+                if not chunk:
+                    raise ValueError(f"Unexpected end of '{self._file_path}'")
+                buffer = buffer[position:] + text_decoder.decode(chunk)
+                position = 0
+
+            def next_char():
+                nonlocal position
+                while True:
+                    while position < len(buffer) and buffer[position].isspace():
+                        position += 1
+                    if position < len(buffer):
+                        return buffer[position]
+                    read_more()
+
+            def decode_value():
+                nonlocal position
+                while True:
+                    try:
+                        value, position = decoder.raw_decode(buffer, position)
+                        return value
+                    except json.JSONDecodeError:
+                        read_more()
+
+            if next_char() != '{':
+                raise ValueError(f"'{self._file_path}' isn't a json object")
+            position += 1
+            while True:
+                char = next_char()
+                if char == '}':
+                    return
+                if char == ',':
+                    position += 1
+                    next_char()
+                key = decode_value()
+                if next_char() != ':':
+                    raise ValueError(f"Invalid json in '{self._file_path}'")
+                position += 1
+                next_char()
+                yield key, decode_value()
+                if position > chunk_size:
+                    buffer = buffer[position:]
+                    position = 0
+
+    def reload_cache(self, file_stamp):
+        """Reloads the cache from the json file, keeping the changes
+        that weren't flushed yet.
+        """
+        if self._compact:
+            movies_data = MovieTable(self.stream_from_json())
+        else:
+            movies_data = self.load_from_json()
+        if self._movies is not None:
+            for title in self._dirty:
+                if title in self._movies:
+                    movies_data[title] = self._movies[title]
+                else:
+                    movies_data.pop(title, None)
+        self._movies = movies_data
+        self._file_stamp = file_stamp
+
+    def flush(self):
+        """Writes the cached changes to the json file, if there are any"""
+        if not self._cache or not self._dirty:
+            return
+        self.save_to_json(self.list_movies())
+        self._dirty.clear()
+        self._dirty_since = None
+
+    @contextmanager
+    def batch(self):
+        """Keeps the changes made in the with block in the cache, also
+        without cache mode, and writes them to the file once at the end"""
+        cache = self._cache
+        self._cache = True
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.flush()
+                self._cache = cache
+                if not cache:
+                    self._movies = None
+
+    def save_changes(self, movies_data, titles):
+        """Saves the changed movies data. Without cache the whole file is
+        rewritten, in cache mode the titles are marked as dirty and flushed
+        when one of the thresholds is reached.
+        """
+        if not self._cache:
+            self.save_to_json(movies_data)
+            return
+
+        if self._dirty_since is None:
+            self._dirty_since = time.monotonic()
+        self._dirty.update(titles)
+        if self._batch_depth:
+            return
+        if (len(self._dirty) >= self._flush_every or
+                time.monotonic() - self._dirty_since >= self._flush_interval):
+            self.flush()
 
     def add_movie(self, movie_dict):
         """Adds a movie to the movies database.
@@ -46,7 +241,7 @@ class StorageJson(IStorage):
         """
         movies_data = self.list_movies()
         movies_data.update(movie_dict)
-        self.save_to_json(movies_data)
+        self.save_changes(movies_data, movie_dict.keys())
 
     def delete_movie(self, title):
         """Deletes a movie from the movies database.
@@ -55,7 +250,7 @@ class StorageJson(IStorage):
         """
         movies_data = self.list_movies()
         del movies_data[title]
-        self.save_to_json(movies_data)
+        self.save_changes(movies_data, [title])
 
     def update_movie(self, title, value, key="note"):
         """Updates a movie from the movies database.
@@ -64,4 +259,4 @@ class StorageJson(IStorage):
         """
         movies_data = self.list_movies()
         movies_data[title][key] = value
-        self.save_to_json(movies_data)
+        self.save_changes(movies_data, [title])
@@ -0,0 +1,223 @@
+import json
+import sqlite3
+from bisect import bisect_right
+from contextlib import contextmanager
+from .istorage import IStorage
+
+MOVIE_COLUMNS = ('title', 'rating', 'year', 'genre', 'img', 'director',
+                 'country', 'alpha_2', 'imdbID', 'note')
+
+
+class StorageSqlite(IStorage):
+    """SQLite storage class, allows the movie app use a sqlite database.
+
+    Besides the IStorage methods it offers query methods that run inside
+    the database using its indexes: top_movies, search_movies,
+    rating_histogram and rating_aggregates. MovieApp uses them when the
+    storage has them instead of loading the whole catalogue.
+    """
+    def __init__(self, file_path):
+        self._file_path = file_path
+        self._connection = sqlite3.connect(file_path)
+        self._batch_depth = 0
+        self.create_tables()
+
+    def create_tables(self):
+        """Creates the movies table and its indexes if they don't exist"""
+        with self._connection:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS movies (
+                    key TEXT PRIMARY KEY,
+                    title TEXT, rating REAL, year INTEGER, genre TEXT,
+                    img TEXT, director TEXT, country TEXT, alpha_2 TEXT,
+                    imdbID TEXT, note TEXT, extra TEXT)''')
+            for column in ('title', 'rating', 'year', 'director'):
+                self._connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS movies_{column} '
+                    f'ON movies ({column})')
+
+    @staticmethod
+    def row_to_movie(row):
+        """Converts a (key, columns..., extra) database row to a movie
+        key and dict, skipping empty columns like the CSV storage does.
+        """
+        movie_dict = {column: value for column, value
+                      in zip(MOVIE_COLUMNS, row[1:-1]) if value is not None}
+        if row[-1]:
+            movie_dict.update(json.loads(row[-1]))
+        return row[0], movie_dict
+
+    def select_movies(self, query_end='', params=()):
+        """Runs a select over the movies table with the provided WHERE/ORDER
+        clause and returns the rows as an ordered dict of movie dicts.
+        """
+        columns = ', '.join(MOVIE_COLUMNS)
+        rows = self._connection.execute(
+            f'SELECT key, {columns}, extra FROM movies {query_end}', params)
+        return dict(self.row_to_movie(row) for row in rows)
+
+    def data_files(self):
+        """Returns the paths of the files holding the storage data"""
+        return [self._file_path]
+
+    def list_movies(self):
+        """Returns a dictionary of dictionaries that
+        contains the movies information in the database.
+        The function loads the information from the database
+        and returns the data.
+
+        For example, the function may return:
+        {
+          "titanic": {
+            "title": "Titanic",
+            "rating": 9,
+            "year": 1999
+            ...
+          },
+          "..." {
+            ...
+          },
+        }
+        """
+        return self.select_movies('ORDER BY rowid')
+
+    def iter_movies(self):
+        """Yields (title, movie dict) pairs straight from a database cursor,
+        without loading all the movies"""
+        columns = ', '.join(MOVIE_COLUMNS)
+        rows = self._connection.execute(
+            f'SELECT key, {columns}, extra FROM movies ORDER BY rowid')
+        return map(self.row_to_movie, rows)
+
+    @contextmanager
+    def transaction(self):
+        """Commits the changes made in the with block, or rolls them back
+        if it fails. Inside a batch they are committed with the batch."""
+        if self._batch_depth:
+            yield
+            return
+        with self._connection:
+            yield
+
+    @contextmanager
+    def batch(self):
+        """Runs the changes made in the with block in a single transaction,
+        which is rolled back if the block fails"""
+        self._batch_depth += 1
+        try:
+            if self._batch_depth > 1:
+                yield self
+            else:
+                with self._connection:
+                    yield self
+        finally:
+            self._batch_depth -= 1
+
+    def get_movie(self, title):
+        """Returns the movie dict of the title, None if it's not in the
+        database"""
+        columns = ', '.join(MOVIE_COLUMNS)
+        row = self._connection.execute(
+            f'SELECT key, {columns}, extra FROM movies WHERE key = ?',
+            (title,)).fetchone()
+        return None if row is None else self.row_to_movie(row)[1]
+
+    def add_movie(self, movie_dict):
+        """Adds a movie to the database, replacing a movie with the same key.
+        The function doesn't validate the input.
+        """
+        names = ', '.join(MOVIE_COLUMNS)
+        marks = ', '.join('?' * (len(MOVIE_COLUMNS) + 2))
+        updates = ', '.join(f'{column} = excluded.{column}'
+                            for column in MOVIE_COLUMNS + ('extra',))
+        rows = []
+        for key, movie in movie_dict.items():
+            extra = {name: value for name, value in movie.items()
+                     if name not in MOVIE_COLUMNS}
+            rows.append((key, *(movie.get(column) for column in MOVIE_COLUMNS),
+                         json.dumps(extra) if extra else None))
+        with self.transaction():
+            self._connection.executemany(
+                f'INSERT INTO movies (key, {names}, extra) VALUES ({marks}) '
+                f'ON CONFLICT(key) DO UPDATE SET {updates}', rows)
+
+    def delete_movie(self, title):
+        """Deletes a movie from the database.
+        The function doesn't validate the input.
+        """
+        with self.transaction():
+            self._connection.execute('DELETE FROM movies WHERE key = ?',
+                                     (title,))
+
+    def update_movie(self, title, value, key="note"):
+        """Updates a movie field in the database.
+        The function doesn't validate the input.
+        """
+        with self.transaction():
+            if key in MOVIE_COLUMNS:
+                self._connection.execute(
+                    f'UPDATE movies SET {key} = ? WHERE key = ?',
+                    (value, title))
+                return
+            row = self._connection.execute(
+                'SELECT extra FROM movies WHERE key = ?', (title,)).fetchone()
+            extra = json.loads(row[0]) if row[0] else {}
+            extra[key] = value
+            self._connection.execute(
+                'UPDATE movies SET extra = ? WHERE key = ?',
+                (json.dumps(extra), title))
+
+    def top_movies(self, limit=None, is_descending=True):
+        """Returns the movies sorted by rating, keeping the storage order
+        for equal ratings. If limit is provided returns only the first ones.
+        """
+        order = 'DESC' if is_descending else 'ASC'
+        return self.select_movies(f'ORDER BY rating {order}, rowid LIMIT ?',
+                                  (-1 if limit is None else limit,))
+
+    def search_movies(self, query):
+        """Returns the movies whose key contains the lowercase query"""
+        return self.select_movies('WHERE instr(key, ?) > 0 ORDER BY rowid',
+                                  (query.lower(),))
+
+    def rating_histogram(self, bins):
+        """Takes ascending bin edges and returns the amount of movies in each
+        bin. Like numpy histograms, all bins but the last are half-open and
+        ratings outside the edges aren't counted.
+        """
+        bins = list(bins)
+        counts = [0] * (len(bins) - 1)
+        rows = self._connection.execute(
+            'SELECT rating, COUNT(*) FROM movies WHERE rating BETWEEN ? AND ? '
+            'GROUP BY rating', (bins[0], bins[-1]))
+        for rating, amount in rows:
+            index = min(bisect_right(bins, rating) - 1, len(counts) - 1)
+            counts[index] += amount
+        return counts
+
+    def rating_aggregates(self):
+        """Returns a dict with the amount of rated movies, their average,
+        median, lowest and highest rating and the titles of the best and
+        worst rated movies.
+        """
+        count, average, lowest, highest = self._connection.execute(
+            'SELECT COUNT(rating), AVG(rating), MIN(rating), MAX(rating) '
+            'FROM movies').fetchone()
+        if not count:
+            return None
+        middle = self._connection.execute(
+            'SELECT rating FROM movies WHERE rating IS NOT NULL '
+            'ORDER BY rating LIMIT ? OFFSET ?',
+            (2 - count % 2, (count - 1) // 2)).fetchall()
+        median = sum(row[0] for row in middle) / len(middle)
+
+        def titles_rated(rating):
+            rows = self._connection.execute(
+                'SELECT DISTINCT title FROM movies WHERE rating = ? '
+                'ORDER BY rowid', (rating,))
+            return [row[0] for row in rows]
+
+        return {'count': count, 'average': average, 'median': median,
+                'min': lowest, 'max': highest,
+                'best_movies': titles_rated(highest),
+                'worst_movies': titles_rated(lowest)}
@@ -0,0 +1,344 @@
+import pytest
+import asyncio
+import io
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from thefuzz import process
+from se105_3.movies_project.storage.storage_json import StorageJson
+from se105_3.movies_project.commands.bulk_import import BulkImporter
+from se105_3.movies_project.commands.api_cache import ApiResponseCache
+from se105_3.movies_project.commands.country_resolver import CountryResolver
+from se105_3.movies_project.commands.search_index import SearchIndex
+from se105_3.movies_project.commands.sorted_index import SortedIndex
+from se105_3.movies_project.commands.movie_stats import MovieStats
+from se105_3.movies_project.commands.movie_writer import MovieWriter
+from se105_3.movies_project.commands.stats_index import StatsIndex
+from se105_3.movies_project.commands.histogram import HistogramGenerator
+from se105_3.movies_project.commands.web_gen import WebGenerator
+from se105_3.movies_project.commands.profiler import Profiler
+from se105_3.movies_project.commands.async_api_request import \
+    AsyncMovieAPIRequest
+from se105_3.movies_project.benchmarks.stub_omdb import start_stub_server
+
+
+def fake_movie_data(title):
+    if title == "typo":
+        return {"error": "Movie not found!"}
+    if title == "broken":
+        raise ValueError("invalid literal for int()")
+    if title.lower() in ("matrix", "the matrix"):
+        return {"the matrix": {"title": "The Matrix", "rating": 8.7,
+                               "year": 1999}}
+    return {title.lower(): {"title": title, "rating": 7.0, "year": 2000}}
+
+
+def test_bulk_import_read_titles():
+    lines = ["Alien\n", "\n", "# comment\n", "alien\n", " Heat \n"]
+    assert BulkImporter.read_titles(lines) == ["Alien", "Heat"]
+
+
+def test_bulk_import_titles(tmp_path):
+    storage = StorageJson(os.path.join(tmp_path, "import.json"))
+    storage.add_movie({"heat": {"title": "Heat", "rating": 8.3, "year": 1995}})
+    importer = BulkImporter(storage, max_workers=2)
+    importer.api_request.get_movie_data = fake_movie_data
+    new_movies, failures, existing = importer.import_titles(
+        ["Alien", "typo", "broken", "Heat"])
+    assert list(new_movies) == ["alien"]
+    assert failures["typo"] == "Movie not found!"
+    assert failures["broken"].startswith("ValueError")
+    assert existing == ["Heat"]
+    assert list(storage.list_movies()) == ["heat", "alien"]
+
+
+def test_bulk_import_resolved_keys(tmp_path):
+    storage = StorageJson(os.path.join(tmp_path, "import.json"))
+    storage.add_movie({"the matrix": {"title": "The Matrix", "rating": 8.7,
+                                      "year": 1999, "note": "Red pill"}})
+    importer = BulkImporter(storage, max_workers=2)
+    importer.api_request.get_movie_data = fake_movie_data
+    new_movies, _, existing = importer.import_titles(["Matrix", "Alien"])
+    assert list(new_movies) == ["alien"]
+    assert existing == ["Matrix"]
+    assert storage.list_movies()["the matrix"]["note"] == "Red pill"
+
+
+def test_async_api_get_many():
+    server, api_url = start_stub_server()
+
+    async def fetch():
+        async with AsyncMovieAPIRequest(api_url=api_url) as api_request:
+            return await api_request.get_many(
+                ["Alien", "missing title", "broken title", "unrated title",
+                 "series title", "nowhere title"])
+
+    results = asyncio.run(fetch())
+    server.shutdown()
+    assert results["Alien"]["alien"]["rating"] == 7.5
+    assert results["missing title"] == {"error": "Movie not found!"}
+    assert results["broken title"] == {"error": "Invalid response"}
+    assert results["unrated title"] == {"error": "Invalid movie data"}
+    assert results["series title"]["series title"]["year"] == 2011
+    assert results["nowhere title"]["error"].startswith("LookupError")
+
+
+def test_async_api_connection_error():
+    async def fetch():
+        async with AsyncMovieAPIRequest(api_url="http://127.0.0.1:9/",
+                                        retries=1, backoff=0) as api_request:
+            return await api_request.get_movie_data("Alien")
+
+    assert asyncio.run(fetch()) == {"error": "Connection error"}
+
+
+def test_api_cache_hits_and_eviction(tmp_path):
+    cache = ApiResponseCache(os.path.join(tmp_path, "cache.sqlite"),
+                             max_entries=3, negative_ttl=-1)
+    cache.put("godfather", {"Title": "The Godfather", "imdbID": "tt0068646"})
+    assert cache.get("The  GODFATHER")["imdbID"] == "tt0068646"
+    assert cache.get_by_id("tt0068646")["Title"] == "The Godfather"
+    cache.put("typo", {"Response": "False", "Error": "Movie not found!"})
+    assert cache.get("typo") is None
+    cache.put("alien", {"Title": "Alien"})
+    assert cache.get("godfather") is None
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
+def test_api_cache_skips_transient_errors(tmp_path):
+    cache = ApiResponseCache(os.path.join(tmp_path, "cache.sqlite"))
+    cache.put("alien", {"Response": "False",
+                        "Error": "Request limit reached!"})
+    assert cache.get("alien") is None
+    cache.put("typo", {"Response": "False", "Error": "Movie not found!"})
+    assert cache.get("typo")["Error"] == "Movie not found!"
+    cache.close()
+
+
+def test_country_resolver_table(tmp_path):
+    table_path = os.path.join(tmp_path, "countries.json")
+    resolver = CountryResolver(table_path)
+    table = resolver.get_table()
+    assert table["united states"] == "US"
+    assert table["west germany"] == "DE"
+    assert resolver.resolve_all("United States, UK, France") == \
+        ["US", "GB", "FR"]
+    assert CountryResolver(table_path).resolve_first("UK, USA") == "GB"
+
+
+def test_search_index():
+    keys = ["the lion king", "forrest gump", "the king's speech", "up"]
+    index = SearchIndex((key, {"title": key.title()}) for key in keys)
+    assert index.search("KING") == ["the lion king", "the king's speech"]
+    assert index.search("u") == ["forrest gump", "up"]
+    assert index.get("up") == {"title": "Up", "rating": None, "year": None}
+    index.remove("the lion king")
+    index.add("king kong", {"title": "King Kong", "rating": 7.7})
+    assert index.search("king") == ["the king's speech", "king kong"]
+    assert index.get("king kong")["rating"] == 7.7
+    assert index.fuzzy_search("forest gump") == ["forrest gump"]
+    assert index.fuzzy_search("xyz") == []
+
+
+def test_search_index_fuzzy_matches_full_extract():
+    words = ["the", "lord", "rings", "star", "wars", "dark", "knight",
+             "alien", "return", "king", "heat", "up", "toy", "story", "jaws"]
+    generator = random.Random(7)
+    keys = list(dict.fromkeys(
+        " ".join(generator.sample(words, generator.randint(1, 4)))
+        for _ in range(1000)))
+    index = SearchIndex((key, {"title": key}) for key in keys)
+    queries = ["empire up night", "club dark s", "l rd ingsalie", "tey stroy",
+               "kngi", "xqzv", "the lord of the rings", "uo", "wars tsar"]
+    for query in queries:
+        assert index.fuzzy_search(query) == [
+            key for key, ratio in process.extract(query, keys) if ratio > 75]
+
+
+def test_movie_stats_single_pass():
+    movies = [{"title": "A", "rating": 7.0}, {"title": "B", "rating": 9.0},
+              {"title": "C", "rating": 5.0}, {"title": "D", "rating": 9.0}]
+    stats = MovieStats(movie for movie in movies)
+    assert stats.average == 7.5
+    assert stats.median == 8.0
+    assert stats.best_movies == ["B", "D"]
+    assert stats.worst_movies == ["C"]
+    assert MovieStats({"a": movies[0]}).median == 7.0
+    remakes = movies + [{"title": "B", "rating": 9.0}]
+    assert MovieStats(remakes).best_movies == ["B", "D"]
+
+
+def test_stats_index_updates_and_checksum(tmp_path):
+    data_path = os.path.join(tmp_path, "movies.json")
+    storage = StorageJson(data_path)
+    storage.add_movie({
+        "a": {"title": "A", "rating": 7.0, "year": 1994, "genre": "Drama"},
+        "b": {"title": "B", "rating": 9.0, "year": 2001, "genre": "Drama"},
+        "c": {"title": "C", "rating": 5.0, "year": 2003, "genre": "War"}})
+    stats_index = StatsIndex(storage.list_movies().items())
+    stats_index.remove("c")
+    stats_index.add("d", {"title": "D", "rating": 9.0, "year": 2005})
+    assert stats_index.median == 9.0
+    assert stats_index.best_movies == ["B", "D"]
+    assert stats_index.worst_movies == ["A"]
+    assert stats_index.breakdown("decade")["2000s"]["count"] == 2
+    assert stats_index.breakdown("genre") == {
+        "Drama": {"count": 2, "average": 8.0}}
+    stats_index.add("b 2022", {"title": "B", "rating": 9.0, "year": 2022})
+    assert stats_index.best_movies == ["B", "D"]
+    stats_index.remove("b 2022")
+
+    index_path = data_path + ".stats"
+    stats_index.save(index_path, [data_path])
+    assert StatsIndex.load(index_path, [data_path]).best_movies == ["B", "D"]
+    storage.delete_movie("a")
+    assert StatsIndex.load(index_path, [data_path]) is None
+
+
+def test_sorted_index_pages():
+    movies = {"c": {"title": "C", "rating": 8.0, "year": 2000},
+              "a": {"title": "A", "rating": 9.0, "year": 1990},
+              "b": {"title": "b", "rating": 8.0, "year": 2010},
+              "d": {"title": "D", "rating": 7.0, "year": 2000}}
+    sorted_index = SortedIndex()
+    assert sorted_index.get_page(movies, limit=2) == ["a", "c"]
+    assert sorted_index.get_page(movies) == ["a", "c", "b", "d"]
+    assert sorted_index.get_page(movies, offset=1, limit=2) == ["c", "b"]
+    assert sorted_index.get_page(movies, ("rating", "title"),
+                                 is_descending=False) == ["d", "b", "c", "a"]
+    assert sorted_index.get_page(movies, ("year", "title"),
+                                 limit=3) == ["b", "d", "c"]
+
+
+def test_movie_writer_formats():
+    rows = [("heat", {"title": "Heat", "rating": 8.3, "year": 1995}),
+            ("up", {"title": "Up", "rating": 8, "year": 2009, "note": "a\tb"})]
+    stream = io.StringIO()
+    assert MovieWriter(stream, batch_size=1).write_rows(rows) == 2
+    assert stream.getvalue() == "Heat: 8.3/10 (1995)\nUp: 8.0/10 (2009)\n"
+
+    stream = io.StringIO()
+    MovieWriter(stream, "jsonl").write_rows(rows)
+    lines = stream.getvalue().splitlines()
+    assert json.loads(lines[1]) == {"key": "up", **rows[1][1]}
+
+    stream = io.StringIO()
+    MovieWriter(stream, "tsv").write_rows(rows)
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 3
+    assert lines[2].split("\t")[-1] == "a b"
+
+
+def test_histogram_counts():
+    movies = [("a", {"title": "A", "rating": 7.5, "year": 1994,
+                     "genre": "Drama, Romance"}),
+              ("b", {"title": "B", "rating": 8.0, "year": 2003,
+                     "genre": "Drama"})]
+    counts = HistogramGenerator.collect_counts(iter(movies))
+    assert counts["ratings"][1] == [0, 0, 0, 0, 0, 0, 0, 1, 1]
+    assert counts["years"] == ([1990, 2000, 2010], [1, 1])
+    assert counts["genres"] == (["Drama", "Romance"], [2, 1])
+
+
+def test_histogram_skips_unchanged(tmp_path):
+    movies = {"a": {"title": "A", "rating": 7.5, "year": 1994}}
+    generator = HistogramGenerator(output_dir=tmp_path)
+    path = os.path.join(tmp_path, "histogram.png")
+    assert generator.generate(movies.items()) == {path: True}
+    assert HistogramGenerator(output_dir=tmp_path).generate(
+        movies.items()) == {path: False}
+    movies["a"]["rating"] = 5.0
+    assert generator.generate(movies.items()) == {path: True}
+    os.utime(path, ns=(0, 0))
+    assert generator.generate(movies.items()) == {path: True}
+    other_path = os.path.join(tmp_path, "other", "chart")
+    os.mkdir(os.path.dirname(other_path))
+    assert generator.generate(movies.items(), file_name=other_path) == \
+        {other_path + ".png": True}
+    assert os.path.isfile(os.path.join(tmp_path, "other", ".histograms.json"))
+
+
+def test_web_generator_skips_unchanged_page(tmp_path):
+    movies = {"heat": {"title": "Heat", "rating": 8.3, "year": 1995,
+                       "img": "heat.jpg", "imdbID": "tt0113277",
+                       "alpha_2": "US"},
+              "up": {"title": "Up", "rating": 8.3, "year": 2009,
+                     "img": "up.jpg", "imdbID": "tt1049413",
+                     "alpha_2": "US"}}
+    path = os.path.join(tmp_path, "index.html")
+    generator = WebGenerator(movies, path)
+    assert generator.generate_web_page()
+    assert not generator.generate_web_page()
+    movies["up"]["note"] = "Balloons"
+    assert generator.generate_web_page()
+    with open(path) as file:
+        html = file.read()
+    assert "David's Movies List" in html
+    assert html.index("Heat") < html.index("Balloons")
+
+
+def test_web_generator_pages(tmp_path):
+    movies = [(f"movie {index}", {"title": f"Movie {index}", "rating": 7.0,
+                                  "year": 2000, "img": f"{index}.jpg",
+                                  "imdbID": f"tt{index}", "alpha_2": "US"})
+              for index in range(5)]
+    generator = WebGenerator(movies)
+    assert generator.stream_web_pages(tmp_path, 2) == 3
+    assert generator.written_count == 4
+    assert sorted(os.listdir(tmp_path)) == [
+        "index.html", "page_2.html", "page_3.html", "search_index.js"]
+    with open(os.path.join(tmp_path, "page_2.html")) as file:
+        html = file.read()
+    assert 'href="index.html"' in html and 'href="page_3.html"' in html
+    assert "Movie 2" in html and "Movie 4" not in html
+    assert 'loading="lazy"' in html
+    assert 'script.src = \'search_index.js\'' in html
+    with open(os.path.join(tmp_path, "search_index.js")) as file:
+        prefix, items = file.read().split(" = ", 1)
+    assert prefix == "window.movieSearchIndex"
+    assert json.loads(items.rstrip().rstrip(";"))[4] == [
+        "Movie 4", 2000, "page_3.html"]
+    assert generator.stream_web_pages(tmp_path, 2) == 3
+    assert generator.written_count == 0
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+    assert WebGenerator(iter(movies)).stream_web_pages(tmp_path, 5) == 1
+    assert not os.path.exists(os.path.join(tmp_path, "page_2.html"))
+
+
+def test_profiler_spans(tmp_path):
+    profiler = Profiler()
+    storage = StorageJson(os.path.join(tmp_path, "profile.json"))
+    storage.save_to_json({"heat": {"title": "Heat", "rating": 8.3}})
+    profiler.patch(storage, "iter_movies", "storage.iter_movies")
+    action = profiler.wrap(lambda: list(storage.iter_movies()), "list")
+    assert action() == [("heat", {"title": "Heat", "rating": 8.3})]
+    assert set(profiler.spans) == {("list",),
+                                   ("list", "storage.iter_movies")}
+    calls, total, self_time = profiler.spans[("list",)]
+    assert calls == 1 and 0 <= self_time <= total
+    profiler.uninstall()
+    assert "iter_movies" not in vars(storage)
+    path = os.path.join(tmp_path, "profile.folded")
+    profiler.write_folded(path)
+    with open(path) as file:
+        assert file.read().splitlines()[1].startswith(
+            "list;storage.iter_movies ")
+
+
+def test_profiler_threads():
+    profiler = Profiler()
+    request = profiler.wrap(lambda: time.sleep(0.01), "request")
+    bulk_import = profiler.wrap(
+        lambda: list(ThreadPoolExecutor(4).map(lambda _: request(), range(8))),
+        "bulk_import")
+    bulk_import()
+    assert set(profiler.spans) == {("bulk_import",), ("request",)}
+    assert profiler.spans[("request",)][0] == 8
+    calls, total, self_time = profiler.spans[("bulk_import",)]
+    assert calls == 1 and self_time == total
+
+
+pytest.main()
@@ -1,12 +1,157 @@
 import pytest
+import io
+import json
 import os
 from pathlib import Path
+from se105_3.movies_project.movie_app import MovieApp
+from se105_3.movies_project.storage.storage_json import StorageJson
+from se105_3.movies_project.storage.storage_sqlite import StorageSqlite
+from se105_3.movies_project.commands.command_runner import CommandRunner
+from se105_3.movies_project.commands.api_request import MovieAPIRequest
 
+DATA = {"heat": {"title": "Heat", "rating": 8.3, "year": 1995},
+        "up": {"title": "Up", "rating": 8.2, "year": 2009}}
 
-def test_movie_app_exit_program():
-    pass
 
+def make_app(tmp_path):
+    storage = StorageJson(os.path.join(tmp_path, "movies.json"))
+    storage.save_to_json(DATA)
+    return MovieApp(storage)
 
-def test_movie_app_choose_action_():
-    pass
 
+def test_movie_app_exit_program(tmp_path):
+    movie_app = make_app(tmp_path)
+    with pytest.raises(MovieApp.BreakException):
+        movie_app.exit_program()
+
+
+def test_movie_app_run_end_of_input(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "movies.json")
+    StorageJson(path).save_to_json(DATA)
+    movie_app = MovieApp(StorageJson(path, cache=True))
+    answers = iter(["4", "heat", "Watch again", ""])
+
+    def read_input(prompt=""):
+        for answer in answers:
+            return answer
+        raise EOFError
+
+    monkeypatch.setattr("builtins.input", read_input)
+    movie_app.run()
+    assert StorageJson(path).list_movies()["heat"]["note"] == "Watch again"
+
+
+def test_movie_app_choose_action_(tmp_path, monkeypatch):
+    answers = iter(["list", "42", "3"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    assert make_app(tmp_path).choose_action() == 3
+
+
+def test_movie_app_list_movies(tmp_path, capsys):
+    make_app(tmp_path).list_movies()
+    assert capsys.readouterr().out == \
+        "Heat: 8.3/10 (1995)\nUp: 8.2/10 (2009)\n2 movies in total\n\n"
+
+
+def test_movie_app_update_movie(tmp_path, capsys):
+    movie_app = make_app(tmp_path)
+    movie_app.update_movie("Up", "Balloons")
+    assert movie_app.storage.list_movies()["up"]["note"] == "Balloons"
+    assert "successfully updated" in capsys.readouterr().out
+
+
+def test_movie_app_sorted_outside_change(tmp_path):
+    movie_app = make_app(tmp_path)
+    assert list(movie_app.get_sorted_movies(sort_fields=["year"])) == \
+        ["up", "heat"]
+    path = os.path.join(tmp_path, "movies.json")
+    StorageJson(path).save_to_json({**DATA, "heat": {**DATA["heat"],
+                                                     "year": 2020}})
+    os.utime(path, ns=(0, 10 ** 9))
+    assert list(movie_app.get_sorted_movies(sort_fields=["year"])) == \
+        ["heat", "up"]
+
+
+def test_movie_app_stats_index_outside_change(tmp_path):
+    movie_app = make_app(tmp_path)
+    assert movie_app.get_stats_summary()["best_movies"] == ["Heat"]
+    path = os.path.join(tmp_path, "movies.json")
+    StorageJson(path).save_to_json(
+        {**DATA, "alien": {"title": "Alien", "rating": 9.5, "year": 1979}})
+    os.utime(path, ns=(0, 10 ** 9))
+    movie_app.close()
+    assert not os.path.exists(path + ".stats")
+    summary = MovieApp(StorageJson(path)).get_stats_summary()
+    assert summary["best_movies"] == ["Alien"]
+
+
+def test_command_runner(tmp_path):
+    movie_app = make_app(tmp_path)
+    stream = io.StringIO()
+    lines = ['update Heat "Watch again"', "", "# comment", "get heat",
+             "delete up", "delete up", "top 1", "search he", "stats",
+             "update heat", "rate heat 9"]
+    assert CommandRunner(movie_app, stream).run(lines) == (6, 3)
+    results = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [result["ok"] for result in results] == \
+        [True, True, True, False, True, True, True, False, False]
+    assert results[1]["movies"][0]["note"] == "Watch again"
+    assert results[3]["error"] == "Movie 'up' doesn't exist!"
+    assert [movie["key"] for movie in results[4]["movies"]] == ["heat"]
+    assert results[6]["stats"]["best_movies"] == ["Heat"]
+    assert results[7]["error"] == "Usage: update TITLE NOTE"
+    assert results[8]["error"].startswith("Unknown command 'rate'")
+    assert list(StorageJson(os.path.join(tmp_path, "movies.json"))
+                .list_movies()) == ["heat"]
+
+
+def test_command_runner_malformed_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(MovieAPIRequest, "get_movie_data",
+                        lambda self, title: None)
+    movie_app = make_app(tmp_path)
+    stream = io.StringIO()
+    lines = ['update heat "Watch again\n', "add Alien\n", "top ten\n",
+             "delete up\n"]
+    assert CommandRunner(movie_app, stream).run(lines) == (1, 3)
+    results = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert results[0] == {"line": 'update heat "Watch again', "ok": False,
+                          "error": "Invalid line: No closing quotation"}
+    assert results[1]["error"] == "Invalid movie data"
+    assert results[2]["error"] == "Limit 'ten' is not a number"
+    assert list(StorageJson(os.path.join(tmp_path, "movies.json"))
+                .list_movies()) == ["heat"]
+
+
+def test_command_runner_aborted_batch(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "movies.sqlite")
+    storage = StorageSqlite(path)
+    storage.add_movie(DATA)
+    movie_app = MovieApp(storage)
+
+    def fail():
+        raise RuntimeError("disk on fire")
+
+    monkeypatch.setattr(movie_app, "get_stats_summary", fail)
+    stream = io.StringIO()
+    with pytest.raises(RuntimeError):
+        CommandRunner(movie_app, stream).run(
+            ["delete up", "stats", "delete heat"])
+    results = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert results[0]["ok"]
+    assert results[1] == {"ok": False, "aborted": True,
+                          "error": "RuntimeError: disk on fire"}
+    assert list(StorageSqlite(path).list_movies()) == ["heat"]
+
+
+def test_command_runner_corrupt_storage(tmp_path):
+    movie_app = make_app(tmp_path)
+    with open(os.path.join(tmp_path, "movies.json"), "w") as file:
+        file.write('{"heat": ')
+    stream = io.StringIO()
+    with pytest.raises(ValueError):
+        CommandRunner(movie_app, stream).run(["get heat", "delete up"])
+    results = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(results) == 1 and results[0]["aborted"]
+
+
+pytest.main()
@@ -1,9 +1,14 @@
 import pytest
 import os
+import pickle
 from pathlib import Path
 from se105_3.movies_project.storage.storage_json import StorageJson
 from se105_3.movies_project.storage.istorage import IStorage
 from se105_3.movies_project.storage.storage_csv import StorageCsv
+from se105_3.movies_project.storage.storage_journal import StorageJournal
+from se105_3.movies_project.storage.storage_sqlite import StorageSqlite
+from se105_3.movies_project.storage.movie_table import MovieTable
+from se105_3.movies_project.storage.storage_binary import StorageBinary
 
 ROOT_PATH = Path(__file__).parent.parent
 DATA = {"forrest gump": {
@@ -68,6 +73,161 @@ def test_storage_json_update_movie():
     assert storage.list_movies()[movie_title]["note"] == note
 
 
+def test_storage_json_cache_flush(tmp_path):
+    path = os.path.join(tmp_path, "cache.json")
+    storage = StorageJson(path, cache=True, flush_every=2)
+    storage.add_movie(DATA)
+    assert StorageJson(path).list_movies() == {}
+    storage.add_movie(DATA2)
+    assert len(StorageJson(path).list_movies()) == 2
+    storage.update_movie("the lion king", "Bla bla")
+    storage.flush()
+    assert StorageJson(path).list_movies()["the lion king"]["note"] == "Bla bla"
+
+
+def test_storage_json_cache_reload(tmp_path):
+    path = os.path.join(tmp_path, "cache.json")
+    storage = StorageJson(path, cache=True)
+    storage.add_movie(DATA)
+    StorageJson(path).save_to_json(DATA2)
+    assert storage.list_movies() == {**DATA2, **DATA}
+
+
+def test_storage_json_iter_movies(tmp_path):
+    path = os.path.join(tmp_path, "stream.json")
+    storage = StorageJson(path)
+    storage.save_to_json({**DATA, **DATA2})
+    assert list(storage.iter_movies()) == list({**DATA, **DATA2}.items())
+    assert list(storage.stream_from_json(chunk_size=8)) == \
+        list(storage.list_movies().items())
+    storage.save_to_json({})
+    assert list(storage.iter_movies()) == []
+
+
+def test_storage_json_compact_cache(tmp_path):
+    path = os.path.join(tmp_path, "compact.json")
+    storage = StorageJson(path, cache=True, compact=True)
+    storage.add_movie({**DATA, **DATA2})
+    storage.update_movie("forrest gump", "Bla bla")
+    storage.delete_movie("the lion king")
+    storage.flush()
+    assert isinstance(storage.list_movies(), MovieTable)
+    with open(path) as file:
+        saved = file.read()
+    StorageJson(path).save_to_json(StorageJson(path).list_movies())
+    with open(path) as file:
+        assert file.read() == saved
+    assert StorageJson(path).list_movies() == \
+        {"forrest gump": {**DATA["forrest gump"], "note": "Bla bla"}}
+
+
+def test_storage_json_batch(tmp_path):
+    path = os.path.join(tmp_path, "batch.json")
+    storage = StorageJson(path, cache=False)
+    storage.add_movie(DATA)
+    with storage.batch():
+        storage.add_movie(DATA2)
+        for index in range(100):
+            storage.update_movie("forrest gump", f"note {index}")
+        assert storage.get_movie("the lion king") == DATA2["the lion king"]
+        assert list(StorageJson(path).list_movies()) == ["forrest gump"]
+    movies = StorageJson(path).list_movies()
+    assert list(movies) == ["forrest gump", "the lion king"]
+    assert movies["forrest gump"]["note"] == "note 99"
+
+
+# ==================== Testing movie table ==================================
+def test_movie_table_round_trip():
+    movies = {**DATA, **DATA2,
+              "odd key": {"title": "Odd", "rating": "N/A", "year": 0}}
+    table = MovieTable(movies)
+    assert len(table) == 3
+    assert list(table) == list(movies)
+    assert {key: dict(movie) for key, movie in table.items()} == movies
+    assert table == movies
+
+
+def test_movie_table_img_values():
+    images = ["poster.jpg", "", "/poster.jpg", "https://a.com/p/", "a/b/c"]
+    movies = {f"movie {index}": {"title": "Movie", "img": img}
+              for index, img in enumerate(images)}
+    table = MovieTable(movies)
+    assert [movie["img"] for movie in table.values()] == images
+    table["movie 0"]["img"] = "https://a.com/poster.jpg"
+    table["movie 0"]["img"] = "poster.png"
+    assert table["movie 0"]["img"] == "poster.png"
+    del table["movie 1"]["img"]
+    assert "img" not in table["movie 1"]
+
+
+def test_movie_table_changes():
+    table = MovieTable(DATA)
+    table["forrest gump"]["note"] = "Bla bla"
+    table["forrest gump"]["title"] = "Forrest"
+    table.update(DATA2)
+    assert table["forrest gump"]["note"] == "Bla bla"
+    assert table["forrest gump"]["title"] == "Forrest"
+    del table["forrest gump"]
+    assert "forrest gump" not in table
+    assert dict(table) == DATA2
+    for index in range(100):
+        table[f"movie {index}"] = {"title": f"Movie {index}", "rating": 5.5}
+    assert len(table) == 101
+    assert table["movie 42"] == {"title": "Movie 42", "rating": 5.5}
+
+
+def test_movie_table_pickle():
+    table = MovieTable({**DATA, **DATA2})
+    del table["forrest gump"]
+    copy = pickle.loads(pickle.dumps(table))
+    assert copy == DATA2
+    copy.update(DATA)
+    assert copy["forrest gump"]["title"] == "Forrest Gump"
+
+
+# ==================== Testing binary storage files =========================
+def test_storage_binary_crud(tmp_path):
+    path = os.path.join(tmp_path, "movies.bin")
+    storage = StorageBinary(path)
+    assert storage.list_movies() == {}
+    storage.add_movie(DATA)
+    storage.add_movie(DATA2)
+    storage.update_movie("the lion king", "Bla bla")
+    assert list(storage.list_movies()) == ["forrest gump", "the lion king"]
+    assert storage.list_movies()["the lion king"]["note"] == "Bla bla"
+    storage.delete_movie("forrest gump")
+    assert StorageBinary(path).list_movies() == \
+        {"the lion king": {**DATA2["the lion king"], "note": "Bla bla"}}
+
+
+def test_storage_binary_batch(tmp_path):
+    path = os.path.join(tmp_path, "movies.bin")
+    storage = StorageBinary(path)
+    with storage.batch():
+        storage.add_movie(DATA)
+        storage.add_movie(DATA2)
+        storage.update_movie("the lion king", "Bla bla")
+        assert storage.get_movie("the lion king")["note"] == "Bla bla"
+        assert StorageBinary(path).list_movies() == {}
+    assert StorageBinary(path).list_movies()["the lion king"]["note"] == \
+        "Bla bla"
+
+
+def test_storage_binary_lookup(tmp_path):
+    movies = {f"movie {index}": {"title": f"Movie {index}", "rating": 7.1,
+                                 "year": 2000 + index % 20}
+              for index in range(200)}
+    movies["odd"] = {"title": "Odd", "rating": "N/A"}
+    storage = StorageBinary(os.path.join(tmp_path, "lookup.bin"))
+    storage.save_snapshot(movies.items())
+    snapshot = storage.list_movies()
+    assert all(key in snapshot for key in movies)
+    assert "movie 200" not in snapshot
+    assert snapshot["movie 77"] == movies["movie 77"]
+    assert snapshot["odd"]["rating"] == "N/A"
+    assert snapshot["odd"].get("year") is None
+
+
 # ==================== Testing CSV storage files ============================
 def test_storage_csv_init():
     path = os.path.join(ROOT_PATH, "storage", "csv_files", "david.csv")
@@ -118,4 +278,123 @@ def test_storage_csv_update_movie():
     assert storage.list_movies()[movie_title]["note"] == note
 
 
+def test_storage_csv_append_and_tombstone(tmp_path):
+    path = os.path.join(tmp_path, "append.csv")
+    storage = StorageCsv(path, compact_ratio=10)
+    storage.add_movie(DATA)
+    storage.update_movie("forrest gump", "Bla")
+    storage.add_movie(DATA2)
+    storage.update_movie("forrest gump", "Bla bla")
+    storage.delete_movie("the lion king")
+    with open(path) as file:
+        assert len(file.readlines()) == 5
+    assert list(storage.list_movies()) == ["forrest gump"]
+    assert storage.list_movies()["forrest gump"]["note"] == "Bla bla"
+    assert storage.list_movies()["forrest gump"]["year"] == 1994
+    storage.compact()
+    with open(path) as file:
+        assert len(file.readlines()) == 2
+    assert storage.list_movies()["forrest gump"]["note"] == "Bla bla"
+
+
+def test_storage_csv_update_without_reading(tmp_path):
+    path = os.path.join(tmp_path, "update.csv")
+    storage = StorageCsv(path, compact_ratio=10)
+    storage.add_movie({"forrest gump": {**DATA["forrest gump"], "note": "1"}})
+    storage.list_movies()
+    bytes_read = storage.bytes_read
+    storage.add_movie(DATA2)
+    storage.update_movie("the lion king", "Bla")
+    storage.update_movie("forrest gump", "Bla bla")
+    assert storage.bytes_read == bytes_read
+    movies = StorageCsv(path).list_movies()
+    assert movies["the lion king"] == {**DATA2["the lion king"], "note": "Bla"}
+    assert movies["forrest gump"]["note"] == "Bla bla"
+    StorageCsv(path).delete_movie("the lion king")
+    storage.update_movie("forrest gump", "Outside")
+    assert storage.bytes_read > bytes_read
+    assert list(StorageCsv(path).list_movies()) == ["forrest gump"]
+
+
+# ==================== Testing journal storage files ========================
+def test_storage_journal_replay(tmp_path):
+    path = os.path.join(tmp_path, "test.jnl")
+    storage = StorageJournal(path)
+    assert isinstance(storage, IStorage)
+    storage.add_movie(DATA)
+    storage.add_movie(DATA2)
+    storage.delete_movie("forrest gump")
+    storage.update_movie("the lion king", "Bla bla")
+    assert StorageJournal(path).list_movies() == storage.list_movies()
+    assert StorageJournal(path).list_movies()["the lion king"]["note"] == \
+        "Bla bla"
+
+
+def test_storage_journal_torn_record(tmp_path):
+    path = os.path.join(tmp_path, "test.jnl")
+    storage = StorageJournal(path)
+    storage.add_movie(DATA)
+    with open(path + ".log", "ab") as file:
+        file.write(b'{"op": "delete", "title": "forr')
+    storage = StorageJournal(path)
+    assert storage.list_movies() == DATA
+    storage.add_movie(DATA2)
+    assert len(StorageJournal(path).list_movies()) == 2
+
+
+def test_storage_journal_compact(tmp_path):
+    path = os.path.join(tmp_path, "test.jnl")
+    storage = StorageJournal(path, min_compact_records=3)
+    storage.add_movie(DATA)
+    storage.update_movie("forrest gump", "1")
+    storage.update_movie("forrest gump", "2")
+    storage.flush()
+    storage.update_movie("forrest gump", "3")
+    assert os.path.getsize(path + ".log") < 100
+    assert StorageJournal(path).list_movies()["forrest gump"]["note"] == "3"
+
+
+# ==================== Testing sqlite storage files =========================
+def test_storage_sqlite_crud(tmp_path):
+    path = os.path.join(tmp_path, "test.sqlite")
+    storage = StorageSqlite(path)
+    assert isinstance(storage, IStorage)
+    storage.add_movie(DATA)
+    storage.add_movie(DATA2)
+    assert storage.list_movies() == {**DATA, **DATA2}
+    storage.update_movie("the lion king", "Bla bla")
+    assert storage.list_movies()["the lion king"]["note"] == "Bla bla"
+    storage.delete_movie("forrest gump")
+    assert list(StorageSqlite(path).list_movies()) == ["the lion king"]
+
+
+def test_storage_sqlite_batch(tmp_path):
+    path = os.path.join(tmp_path, "test.sqlite")
+    storage = StorageSqlite(path)
+    with storage.batch():
+        storage.add_movie(DATA)
+        storage.update_movie("forrest gump", "Bla bla")
+        assert StorageSqlite(path).list_movies() == {}
+    assert storage.get_movie("forrest gump")["note"] == "Bla bla"
+    assert storage.get_movie("the lion king") is None
+    with pytest.raises(KeyError):
+        with storage.batch():
+            storage.delete_movie("forrest gump")
+            raise KeyError("forrest gump")
+    assert list(StorageSqlite(path).list_movies()) == ["forrest gump"]
+
+
+def test_storage_sqlite_queries(tmp_path):
+    path = os.path.join(tmp_path, "test.sqlite")
+    storage = StorageSqlite(path)
+    storage.add_movie({**DATA2, **DATA})
+    assert list(storage.top_movies(limit=1)) == ["forrest gump"]
+    assert list(storage.search_movies("Lion")) == ["the lion king"]
+    assert storage.rating_histogram(range(10)) == [0] * 8 + [2]
+    summary = storage.rating_aggregates()
+    assert summary["median"] == pytest.approx(8.65)
+    assert summary["best_movies"] == ["Forrest Gump"]
+    assert summary["worst_movies"] == ["The Lion King"]
+
+
 pytest.main()